@@ -0,0 +1,82 @@
+"""Tests for the DOCX XML text extractor in wo3old19-08.py.
+
+The app module starts Streamlit and Firestore at import time, so only the
+CloudCompatibleFileConverter.extract_docx_text_xml method (and the class
+constants it reads) is compiled out of the source for these tests.
+"""
+import ast
+import io
+import os
+import re
+import zipfile
+import logging
+from typing import Optional
+from xml.etree.ElementTree import iterparse
+
+SOURCE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "wo3old19-08.py")
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+
+
+def load_converter():
+    tree = ast.parse(open(SOURCE, encoding="utf-8").read())
+    cls = next(n for n in tree.body if isinstance(n, ast.ClassDef) and n.name == "CloudCompatibleFileConverter")
+    cls.body = [
+        n for n in cls.body
+        if (isinstance(n, ast.FunctionDef) and n.name == "extract_docx_text_xml")
+        or (isinstance(n, ast.Assign) and getattr(n.targets[0], "id", "").startswith("DOCX_"))
+    ]
+    namespace = {"io": io, "re": re, "zipfile": zipfile, "Optional": Optional,
+                 "xml_iterparse": iterparse, "logger": logging.getLogger(__name__)}
+    exec(compile(ast.Module(body=[cls], type_ignores=[]), SOURCE, "exec"), namespace)
+    return namespace["CloudCompatibleFileConverter"]
+
+
+FileConverter = load_converter()
+
+
+def make_docx(body_xml: str) -> bytes:
+    document = (
+        f'<w:document xmlns:w="{W_NS}"'
+        ' xmlns:mc="http://schemas.openxmlformats.org/markup-compatibility/2006"'
+        ' xmlns:wps="http://schemas.microsoft.com/office/word/2010/wordprocessingShape"'
+        ' xmlns:v="urn:schemas-microsoft-com:vml">'
+        f'<w:body>{body_xml}</w:body></w:document>'
+    )
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as docx_zip:
+        docx_zip.writestr("word/document.xml", document)
+    return buffer.getvalue()
+
+
+def text_box(text: str) -> str:
+    paragraph = f'<w:p><w:r><w:t>{text}</w:t></w:r></w:p>'
+    return (
+        '<w:r><mc:AlternateContent>'
+        f'<mc:Choice Requires="wps"><w:drawing><wps:txbx><w:txbxContent>{paragraph}</w:txbxContent></wps:txbx></w:drawing></mc:Choice>'
+        f'<mc:Fallback><w:pict><v:textbox><w:txbxContent>{paragraph}</w:txbxContent></v:textbox></w:pict></mc:Fallback>'
+        '</mc:AlternateContent></w:r>'
+    )
+
+
+def test_text_box_is_extracted_once():
+    docx = make_docx(f'<w:p>{text_box("BOXTEXT")}</w:p><w:p><w:r><w:t>After</w:t></w:r></w:p>')
+    assert FileConverter.extract_docx_text_xml(docx) == "BOXTEXT\n\nAfter"
+
+
+def test_runs_split_inside_a_word_are_joined():
+    docx = make_docx('<w:p><w:r><w:t>imp</w:t></w:r><w:r><w:rPr><w:b/></w:rPr><w:t>ortant</w:t></w:r></w:p>')
+    assert FileConverter.extract_docx_text_xml(docx) == "important"
+
+
+def test_breaks_tabs_headings_and_tables():
+    docx = make_docx(
+        '<w:p><w:pPr><w:pStyle w:val="Heading2"/><w:tabs><w:tab w:val="left" w:pos="720"/></w:tabs></w:pPr>'
+        '<w:r><w:t>Title</w:t></w:r></w:p>'
+        '<w:p><w:r><w:t>a</w:t><w:br/><w:t>b</w:t><w:tab/><w:t>c</w:t></w:r></w:p>'
+        '<w:tbl><w:tr><w:tc><w:p><w:r><w:t>A</w:t></w:r></w:p></w:tc><w:tc><w:p><w:r><w:t>B</w:t></w:r></w:p></w:tc></w:tr></w:tbl>'
+    )
+    assert FileConverter.extract_docx_text_xml(docx) == "## Title\n\na\nb\tc\n\nA | B"
+
+
+def test_empty_document_returns_empty_string():
+    assert FileConverter.extract_docx_text_xml(make_docx("")) == ""
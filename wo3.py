@@ -26,17 +26,34 @@ import uuid
 import webbrowser
 import io
 import zipfile
+import zlib
+import functools
+import re
+import threading
+from collections import OrderedDict
 import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape as xml_escape
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 # Firestore
 try:
     import firebase_admin
     from firebase_admin import credentials, firestore
+    from google.api_core import retry as api_retry
+    # Client-side backoff for transient errors only (Unavailable, DeadlineExceeded, ...); bad requests fail fast
+    FIRESTORE_RETRY = api_retry.Retry(
+        predicate=api_retry.if_transient_error,
+        initial=0.5,
+        maximum=8.0,
+        multiplier=2.0,
+        deadline=60.0
+    )
     FIRESTORE_AVAILABLE = True
 except ImportError:
     firebase_admin = None
     credentials = None
     firestore = None
+    FIRESTORE_RETRY = None
     FIRESTORE_AVAILABLE = False
 
 # PDF processing - use modern pypdf instead of deprecated PyPDF2
@@ -54,6 +71,7 @@ except ImportError:
 # QR generation
 try:
     import qrcode
+    from qrcode.image.svg import SvgPathFillImage
     QR_AVAILABLE = True
 except ImportError:
     QR_AVAILABLE = False
@@ -74,6 +92,40 @@ except ImportError:
     PptxPresentation = None
     PYTHON_PPTX_AVAILABLE = False
 
+# lxml evaluates the DOCX text XPath in C; ElementTree iterparse is the fallback
+try:
+    from lxml import etree as lxml_etree
+    LXML_AVAILABLE = True
+except ImportError:
+    lxml_etree = None
+    LXML_AVAILABLE = False
+
+# Byte-level charset detection for non-UTF-8 text uploads
+try:
+    from charset_normalizer import from_bytes as detect_charset
+    CHARSET_NORMALIZER_AVAILABLE = True
+except ImportError:
+    CHARSET_NORMALIZER_AVAILABLE = False
+
+# ReportLab lays out text PDFs much faster than FPDF; FPDF remains the fallback
+try:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.enums import TA_CENTER
+    from reportlab.lib.units import mm
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+    REPORTLAB_AVAILABLE = True
+except ImportError:
+    REPORTLAB_AVAILABLE = False
+
+# img2pdf wraps JPEG/PNG streams in a PDF without re-encoding them
+try:
+    import img2pdf
+    IMG2PDF_AVAILABLE = True
+except ImportError:
+    img2pdf = None
+    IMG2PDF_AVAILABLE = False
+
 # --------- Improved Logging ----------
 def setup_logger():
     logger = logging.getLogger("autoprint_sender")
@@ -110,27 +162,6 @@ def safe_remove(path: str):
     except Exception as e:
         logger.warning(f"Failed to remove {path}: {e}")
 
-def retry_with_backoff(func, attempts=3, initial_delay=0.5, factor=2.0, *args, **kwargs):
-    """Retry function with exponential backoff"""
-    delay = initial_delay
-    last_exc = None
-    for i in range(attempts):
-        try:
-            return func(*args, **kwargs)
-        except Exception as e:
-            last_exc = e
-            func_name = getattr(func, "__name__", str(func))
-            logger.warning(f"Attempt {i+1}/{attempts} failed for {func_name}: {e}")
-            if i < attempts - 1:  # Don't sleep on last attempt
-                time.sleep(delay)
-                delay *= factor
-    
-    func_name = getattr(func, "__name__", str(func))
-    logger.error(f"All {attempts} attempts failed for {func_name}")
-    if last_exc:
-        raise last_exc
-    return None
-
 # --------- Data classes ----------
 @dataclass
 class PrintSettings:
@@ -149,19 +180,98 @@ class ConvertedFile:
     pdf_name: str
     pdf_bytes: bytes
     settings: PrintSettings
-    original_bytes: Optional[bytes] = None
+    original_bytes: Optional[bytes] = None  # only set for PDF passthrough, where it is the same object as pdf_bytes
     conversion_method: str = "unknown"
     pages: int = 1
 
+# --------- Image helpers ----------
+def draft_within(img: Image.Image, max_dimension: int) -> bool:
+    """Let libjpeg decode an oversized JPEG at 1/2, 1/4 or 1/8 scale (no-op for other formats); True if the size changed"""
+    scale = max(img.width, img.height) / max_dimension
+    if scale < 2:
+        return False
+    full_size = img.size
+    img.draft('RGB', (int(img.width / scale), int(img.height / scale)))
+    return img.size != full_size
+
+def fit_within(img: Image.Image, max_dimension: int) -> Image.Image:
+    """Shrink `img` to fit max_dimension: cheap integer box reduce() first, LANCZOS only for the remainder"""
+    factor = max(img.width, img.height) // max_dimension
+    if factor >= 2:
+        img = img.reduce(factor)
+    img.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+    return img
+
 # --------- Improved FileConverter ----------
+@functools.lru_cache(maxsize=1)
+def text_pdf_styles():
+    """Title and body styles for create_text_pdf, built once per process"""
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'DocTitle',
+        parent=styles['Title'],
+        fontName='Helvetica-Bold',
+        fontSize=16,
+        alignment=TA_CENTER,
+        spaceAfter=5 * mm
+    )
+    body_style = ParagraphStyle(
+        'DocBody',
+        parent=styles['Normal'],
+        fontName='Helvetica',
+        fontSize=11,
+        leading=14,
+        spaceAfter=2 * mm
+    )
+    return title_style, body_style
+
 class FileConverter:
     SUPPORTED_TEXT_EXTENSIONS = {'.txt', '.md', '.rtf', '.html', '.htm', '.csv', '.log'}
     SUPPORTED_IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.bmp', '.tiff', '.tif', '.webp', '.gif'}
+    WORD_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+    W_T = WORD_NS + 't'
+    W_P = WORD_NS + 'p'
+    W_TC = WORD_NS + 'tc'
+    DOCX_TEXT_XPATH = lxml_etree.XPath(
+        '//w:t/text()[normalize-space()]',
+        namespaces={'w': WORD_NS.strip('{}')},
+        smart_strings=False
+    ) if LXML_AVAILABLE else None
     
     @staticmethod
-    def create_text_pdf(text: str, title: str = "Document") -> bytes:
+    def create_text_pdf_reportlab(text: str, title: str = "Document") -> bytes:
+        """Create PDF from text with ReportLab, which wraps, paginates and handles unicode itself"""
+        title_style, body_style = text_pdf_styles()
+        story = [Paragraph(xml_escape(title), title_style)]
+        
+        for paragraph in text.split('\n'):
+            if not paragraph.strip():
+                story.append(Spacer(1, 3 * mm))
+            else:
+                story.append(Paragraph(xml_escape(paragraph), body_style))
+        
+        buffer = io.BytesIO()
+        doc = SimpleDocTemplate(
+            buffer, pagesize=A4, title=title,
+            leftMargin=10 * mm, rightMargin=10 * mm, topMargin=10 * mm, bottomMargin=15 * mm
+        )
+        doc.build(story)
+        return buffer.getvalue()
+    
+    @classmethod
+    def create_text_pdf(cls, text: str, title: str = "Document") -> bytes:
         """Create PDF from text with better formatting"""
+        if REPORTLAB_AVAILABLE:
+            try:
+                return cls.create_text_pdf_reportlab(text, title)
+            except Exception as e:
+                logger.warning(f"ReportLab text PDF failed, falling back to FPDF: {e}")
+        
         try:
+            # FPDF's core fonts are latin-1 only: replace anything outside it once, up front, not per line
+            text = text.encode('latin-1', 'replace').decode('latin-1')
+            title = title.encode('latin-1', 'replace').decode('latin-1')
+            
             pdf = FPDF(unit='mm', format='A4')
             pdf.set_auto_page_break(auto=True, margin=15)
             pdf.add_page()
@@ -182,35 +292,8 @@ class FileConverter:
                     pdf.ln(3)
                     continue
                 
-                # Handle long paragraphs by splitting them
-                max_chars_per_line = 85
-                if len(paragraph) <= max_chars_per_line:
-                    try:
-                        pdf.multi_cell(0, 5, paragraph.encode('latin-1', 'replace').decode('latin-1'))
-                    except:
-                        pdf.multi_cell(0, 5, paragraph.encode('utf-8', 'replace').decode('utf-8', 'replace'))
-                else:
-                    # Split long paragraphs
-                    words = paragraph.split(' ')
-                    current_line = ""
-                    
-                    for word in words:
-                        if len(current_line + word) <= max_chars_per_line:
-                            current_line += word + " "
-                        else:
-                            if current_line:
-                                try:
-                                    pdf.multi_cell(0, 5, current_line.strip().encode('latin-1', 'replace').decode('latin-1'))
-                                except:
-                                    pdf.multi_cell(0, 5, current_line.strip())
-                            current_line = word + " "
-                    
-                    if current_line:
-                        try:
-                            pdf.multi_cell(0, 5, current_line.strip().encode('latin-1', 'replace').decode('latin-1'))
-                        except:
-                            pdf.multi_cell(0, 5, current_line.strip())
-                
+                # multi_cell wraps on actual glyph widths
+                pdf.multi_cell(0, 5, paragraph)
                 pdf.ln(2)
             
             return pdf.output(dest='S').encode('latin-1', errors='replace')
@@ -224,21 +307,26 @@ class FileConverter:
             pdf.multi_cell(0, 10, f"Error creating PDF from text: {str(e)}")
             return pdf.output(dest='S').encode('latin-1', errors='replace')
 
+    @staticmethod
+    def decode_text_bytes(file_content: bytes) -> str:
+        """Decode an uploaded text file: strict UTF-8 (BOM-aware) first, then byte-level charset detection"""
+        try:
+            return file_content.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            pass
+        
+        if CHARSET_NORMALIZER_AVAILABLE:
+            best = detect_charset(file_content).best()
+            if best is not None:
+                return str(best)
+        
+        return file_content.decode('utf-8', errors='replace')
+
     @classmethod
     def convert_text_file(cls, file_content: bytes, filename: str) -> Optional[bytes]:
         """Convert text-based files to PDF"""
         try:
-            # Try different encodings
-            text = None
-            for encoding in ['utf-8', 'utf-8-sig', 'latin-1', 'cp1252', 'ascii']:
-                try:
-                    text = file_content.decode(encoding, errors='ignore')
-                    break
-                except:
-                    continue
-            
-            if not text:
-                text = file_content.decode('utf-8', errors='replace')
+            text = cls.decode_text_bytes(file_content)
             
             if not text.strip():
                 text = f"Empty or unreadable file: {filename}"
@@ -247,22 +335,37 @@ class FileConverter:
             
         except Exception as e:
             logger.error(f"Text file conversion failed for {filename}: {e}")
-            return cls.create_text_pdf(f"Error reading file {filename}: {str(e)}", filename)
+            raise
 
     @classmethod
     def convert_image_file(cls, file_content: bytes, filename: str) -> Optional[bytes]:
         """Convert image files to PDF with better error handling"""
         try:
             with Image.open(io.BytesIO(file_content)) as img:
+                max_dimension = 2000
+                fits = img.width <= max_dimension and img.height <= max_dimension
+                
+                # JPEG/PNG that need no resize are embedded as-is; PIL only re-encodes what img2pdf rejects (e.g. alpha)
+                if IMG2PDF_AVAILABLE and fits and img.format in ('JPEG', 'PNG'):
+                    try:
+                        return img2pdf.convert(file_content)
+                    except Exception as e:
+                        logger.debug(f"img2pdf could not wrap {filename}, re-encoding: {e}")
+                
+                # Palette/bilevel images resize with NEAREST, so convert those before shrinking
+                if img.mode in ('P', '1'):
+                    img = img.convert('RGB')
+                
+                # Resize if too large (memory optimization). Done before any other mode conversion, while the
+                # pixels are still undecoded, so JPEGs can be decoded straight at a reduced scale
+                if not fits:
+                    draft_within(img, max_dimension)
+                    img = fit_within(img, max_dimension)
+                
                 # Handle different image modes
                 if img.mode not in ('RGB', 'L'):
                     img = img.convert('RGB')
                 
-                # Resize if too large (memory optimization)
-                max_dimension = 2000
-                if img.width > max_dimension or img.height > max_dimension:
-                    img.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
-                
                 # Create PDF
                 pdf_buffer = io.BytesIO()
                 img.save(pdf_buffer, format='PDF', optimize=True, quality=85)
@@ -270,37 +373,39 @@ class FileConverter:
                 
         except Exception as e:
             logger.error(f"Image conversion failed for {filename}: {e}")
-            # Create fallback PDF with error message
-            return cls.create_text_pdf(f"Failed to convert image: {filename}\nError: {str(e)}", filename)
+            raise
 
     @classmethod
     def extract_docx_text_xml(cls, file_content: bytes) -> str:
-        """Extract text from DOCX using XML parsing (no external dependencies)"""
+        """Extract text from DOCX using XML parsing (lxml when installed, otherwise the standard library)"""
         try:
             with zipfile.ZipFile(io.BytesIO(file_content), 'r') as docx_zip:
                 if 'word/document.xml' not in docx_zip.namelist():
                     return "No document.xml found in DOCX file"
                 
-                xml_content = docx_zip.read('word/document.xml')
-                root = ET.fromstring(xml_content)
+                if LXML_AVAILABLE:
+                    # No entity expansion or network access for uploaded XML
+                    parser = lxml_etree.XMLParser(resolve_entities=False, no_network=True)
+                    with docx_zip.open('word/document.xml') as xml_stream:
+                        texts = cls.DOCX_TEXT_XPATH(lxml_etree.parse(xml_stream, parser))
+                    return '\n'.join(texts) if texts else "No text content found in DOCX"
                 
-                # Extract text from all text nodes
+                # Stream the XML instead of building the whole tree; elements are freed once read
                 texts = []
-                for elem in root.iter():
-                    if elem.text and elem.text.strip():
-                        # Skip namespace prefixes in tag names
-                        tag_name = elem.tag.split('}')[-1] if '}' in elem.tag else elem.tag
-                        if tag_name == 't':  # text elements
-                            texts.append(elem.text)
-                        elif tag_name in ['p', 'tc']:  # paragraphs and table cells
-                            if elem.text:
+                with docx_zip.open('word/document.xml') as xml_stream:
+                    for _, elem in ET.iterparse(xml_stream, events=('end',)):
+                        if elem.text and elem.text.strip():
+                            if elem.tag == cls.W_T:  # text elements
+                                texts.append(elem.text)
+                            elif elem.tag == cls.W_P or elem.tag == cls.W_TC:  # paragraphs and table cells
                                 texts.append('\n' + elem.text)
+                        elem.clear()
                 
                 return '\n'.join(texts) if texts else "No text content found in DOCX"
                 
         except Exception as e:
             logger.error(f"DOCX XML extraction failed: {e}")
-            return f"Error extracting DOCX content: {str(e)}"
+            raise
 
     @classmethod
     def extract_docx_text_library(cls, file_content: bytes) -> str:
@@ -353,7 +458,7 @@ class FileConverter:
             
         except Exception as e:
             logger.error(f"DOCX conversion failed for {filename}: {e}")
-            return cls.create_text_pdf(f"Error processing DOCX file: {filename}\nError: {str(e)}", filename)
+            raise
 
     @classmethod
     def convert_pptx_file(cls, file_content: bytes, filename: str) -> Optional[bytes]:
@@ -390,90 +495,21 @@ class FileConverter:
             
         except Exception as e:
             logger.error(f"PPTX conversion failed for {filename}: {e}")
-            return cls.create_text_pdf(f"Error processing PPTX file: {filename}\nError: {str(e)}", filename)
+            raise
 
     @classmethod
     def convert_uploaded_file_to_pdf(cls, uploaded_file) -> Optional[ConvertedFile]:
-        """Main conversion method with comprehensive fallbacks"""
+        """Main conversion entry point; results are cached by content so reruns don't convert again"""
         if not uploaded_file:
             return None
         
         filename = uploaded_file.name
-        file_content = uploaded_file.getvalue()
-        suffix = os.path.splitext(filename)[1].lower()
-        
         try:
-            # Handle PDF files (pass through)
-            if suffix == ".pdf":
-                pages = count_pdf_pages(file_content)
-                return ConvertedFile(
-                    orig_name=filename,
-                    pdf_name=filename,
-                    pdf_bytes=file_content,
-                    settings=PrintSettings(),
-                    original_bytes=file_content,
-                    conversion_method="passthrough",
-                    pages=pages
-                )
-            
-            pdf_bytes = None
-            conversion_method = "unknown"
-            
-            # Handle text files
-            if suffix in cls.SUPPORTED_TEXT_EXTENSIONS:
-                pdf_bytes = cls.convert_text_file(file_content, filename)
-                conversion_method = "text"
-            
-            # Handle image files
-            elif suffix in cls.SUPPORTED_IMAGE_EXTENSIONS:
-                pdf_bytes = cls.convert_image_file(file_content, filename)
-                conversion_method = "image"
-            
-            # Handle DOCX files
-            elif suffix == ".docx":
-                pdf_bytes = cls.convert_docx_file(file_content, filename)
-                conversion_method = "docx"
-            
-            # Handle PPTX files
-            elif suffix == ".pptx":
-                pdf_bytes = cls.convert_pptx_file(file_content, filename)
-                conversion_method = "pptx"
-            
-            # Unsupported format
-            else:
-                pdf_bytes = cls.create_text_pdf(
-                    f"Unsupported file format: {suffix}\n\n"
-                    f"File: {filename}\n"
-                    f"Size: {len(file_content)} bytes\n\n"
-                    "Supported formats:\n"
-                    "• PDF (passthrough)\n"
-                    "• Text: .txt, .md, .rtf, .html, .htm, .csv, .log\n"
-                    "• Images: .png, .jpg, .jpeg, .bmp, .tiff, .webp, .gif\n"
-                    "• Documents: .docx, .pptx\n\n"
-                    "Please convert your file to a supported format.",
-                    filename
-                )
-                conversion_method = "unsupported"
-            
-            if pdf_bytes:
-                pages = count_pdf_pages(pdf_bytes)
-                pdf_name = os.path.splitext(filename)[0] + ".pdf"
-                
-                return ConvertedFile(
-                    orig_name=filename,
-                    pdf_name=pdf_name,
-                    pdf_bytes=pdf_bytes,
-                    settings=PrintSettings(),
-                    original_bytes=file_content,
-                    conversion_method=conversion_method,
-                    pages=pages
-                )
-            
-            return None
-            
+            return convert_file_cached(uploaded_file.getvalue(), filename)
         except Exception as e:
+            # Built outside the cache: st.cache_data doesn't store a call that raised,
+            # so a transient failure is retried on the next rerun instead of served for an hour
             logger.error(f"File conversion failed for {filename}: {e}")
-            # Create error PDF as final fallback
             try:
                 error_pdf = cls.create_text_pdf(
                     f"Conversion Error\n\n"
@@ -487,19 +523,162 @@ class FileConverter:
                     pdf_name=f"ERROR_{filename}.pdf",
                     pdf_bytes=error_pdf,
                     settings=PrintSettings(),
-                    original_bytes=file_content,
                     conversion_method="error",
                     pages=1
                 )
             except:
                 return None
 
+    @classmethod
+    def convert_file_content(cls, file_content: bytes, filename: str) -> Optional[ConvertedFile]:
+        """Main conversion method with comprehensive fallbacks; raises on failure so errors are never cached"""
+        suffix = os.path.splitext(filename)[1].lower()
+        
+        # Handle PDF files (pass through)
+        if suffix == ".pdf":
+            pages = count_pdf_pages(file_content)
+            return ConvertedFile(
+                orig_name=filename,
+                pdf_name=filename,
+                pdf_bytes=file_content,
+                settings=PrintSettings(),
+                original_bytes=file_content,
+                conversion_method="passthrough",
+                pages=pages
+            )
+        
+        pdf_bytes = None
+        conversion_method = "unknown"
+        
+        # Handle text files
+        if suffix in cls.SUPPORTED_TEXT_EXTENSIONS:
+            pdf_bytes = cls.convert_text_file(file_content, filename)
+            conversion_method = "text"
+        
+        # Handle image files
+        elif suffix in cls.SUPPORTED_IMAGE_EXTENSIONS:
+            pdf_bytes = cls.convert_image_file(file_content, filename)
+            conversion_method = "image"
+        
+        # Handle DOCX files
+        elif suffix == ".docx":
+            pdf_bytes = cls.convert_docx_file(file_content, filename)
+            conversion_method = "docx"
+        
+        # Handle PPTX files
+        elif suffix == ".pptx":
+            pdf_bytes = cls.convert_pptx_file(file_content, filename)
+            conversion_method = "pptx"
+        
+        # Unsupported format
+        else:
+            pdf_bytes = cls.create_text_pdf(
+                f"Unsupported file format: {suffix}\n\n"
+                f"File: {filename}\n"
+                f"Size: {len(file_content)} bytes\n\n"
+                "Supported formats:\n"
+                "• PDF (passthrough)\n"
+                "• Text: .txt, .md, .rtf, .html, .htm, .csv, .log\n"
+                "• Images: .png, .jpg, .jpeg, .bmp, .tiff, .webp, .gif\n"
+                "• Documents: .docx, .pptx\n\n"
+                "Please convert your file to a supported format.",
+                filename
+            )
+            conversion_method = "unsupported"
+        
+        if pdf_bytes:
+            # Image conversions always emit a single page, so there is nothing to parse
+            pages = 1 if conversion_method == "image" else count_pdf_pages(pdf_bytes)
+            pdf_name = os.path.splitext(filename)[0] + ".pdf"
+            
+            return ConvertedFile(
+                orig_name=filename,
+                pdf_name=pdf_name,
+                pdf_bytes=pdf_bytes,
+                settings=PrintSettings(),
+                conversion_method=conversion_method,
+                pages=pages
+            )
+        
+        return None
+
+@st.cache_data(max_entries=32, ttl=3600, show_spinner=False)
+def convert_file_cached(file_content: bytes, filename: str) -> Optional[ConvertedFile]:
+    """Cached FileConverter.convert_file_content; Streamlit keys the cache on the bytes and filename"""
+    return FileConverter.convert_file_content(file_content, filename)
+
+CONVERT_MAX_WORKERS = 4  # uploads converted concurrently on each rerun
+
 # --------- PDF Page Counting ----------
+PAGE_COUNT_CACHE_SIZE = 256
+_page_counts = OrderedDict()  # sha256 -> pages, most recently used last
+_page_counts_lock = threading.Lock()
+
 def count_pdf_pages(pdf_bytes: Optional[bytes]) -> int:
-    """Count pages in PDF with better error handling"""
+    """Count pages in PDF, memoized by content hash so reruns don't re-parse the same file"""
     if not pdf_bytes:
         return 1
     
+    digest = hashlib.sha256(pdf_bytes).hexdigest()
+    with _page_counts_lock:
+        if digest in _page_counts:
+            _page_counts.move_to_end(digest)
+            return _page_counts[digest]
+    
+    pages = read_pdf_page_count(pdf_bytes)
+    with _page_counts_lock:
+        _page_counts[digest] = pages
+        if len(_page_counts) > PAGE_COUNT_CACHE_SIZE:
+            _page_counts.popitem(last=False)
+    return pages
+
+_RE_PDF_PAGE_OBJ = re.compile(rb'/Type\s*/Page(?![A-Za-z])')
+_RE_PDF_ROOT_REF = re.compile(rb'/Root\s+(\d+)\s+(\d+)\s+R')
+_RE_PDF_PAGES_REF = re.compile(rb'/Pages\s+(\d+)\s+(\d+)\s+R')
+_RE_PDF_COUNT = re.compile(rb'/Count\s+(\d+)')
+
+def pdf_object_body(pdf_bytes: bytes, num: int, gen: int) -> Optional[bytes]:
+    """Bytes between `num gen obj` and its `endobj`, or None if the object isn't stored plainly"""
+    match = re.search(rb'(?<!\d)%d\s+%d\s+obj\b' % (num, gen), pdf_bytes)
+    if not match:
+        return None
+    end = pdf_bytes.find(b'endobj', match.end())
+    return pdf_bytes[match.end():end] if end != -1 else None
+
+def pdf_root_page_count(pdf_bytes: bytes) -> Optional[int]:
+    """/Count of the page tree root, reached through the trailer's /Root catalog"""
+    roots = _RE_PDF_ROOT_REF.findall(pdf_bytes)
+    if not roots:
+        return None
+    catalog = pdf_object_body(pdf_bytes, *map(int, roots[-1]))  # the document trailer comes last
+    pages_ref = _RE_PDF_PAGES_REF.search(catalog) if catalog else None
+    if not pages_ref:
+        return None
+    pages = pdf_object_body(pdf_bytes, *map(int, pages_ref.groups()))
+    count = _RE_PDF_COUNT.search(pages) if pages else None
+    return int(count.group(1)) if count else None
+
+def scan_pdf_page_count(pdf_bytes: bytes) -> Optional[int]:
+    """Count /Type /Page objects straight from the bytes; None when the layout makes that unreliable.
+
+    Object streams (/ObjStm) hide page dicts inside compressed data and incremental updates
+    (more than one %%EOF) can leave superseded page objects behind, so those go to PdfReader.
+    The count prices the job, so it is only trusted when it agrees with the page tree's /Count:
+    orphaned page objects or an uncompressed embedded PDF would otherwise overcharge.
+    """
+    if b'/ObjStm' in pdf_bytes or pdf_bytes.count(b'%%EOF') != 1:
+        return None
+    count = len(_RE_PDF_PAGE_OBJ.findall(pdf_bytes))
+    if not count or count != pdf_root_page_count(pdf_bytes):
+        return None
+    return count
+
+def read_pdf_page_count(pdf_bytes: bytes) -> int:
+    """Parse the page count out of a PDF, estimating from size if it can't be read"""
+    scanned = scan_pdf_page_count(pdf_bytes)
+    if scanned:
+        return scanned
+    
     if not PDF_READER_AVAILABLE:
         logger.warning("PDF reader not available, defaulting to 1 page")
         return 1
@@ -597,12 +776,43 @@ def set_status(message: str):
 
 # --------- Firestore Initialization ----------
 COLLECTION = "files"
-CHUNK_SIZE = 200_000  # characters per chunk
+CHUNK_SIZE = 900_000  # base64 chars (a multiple of 4) or raw bytes per chunk doc; Firestore caps a doc at 1 MiB
+CHUNK_ENCODING = "base64"  # "raw" stores chunks as Firestore bytes fields (no 33% inflation); the receiver must support it
+CHUNK_COMPRESSION = "none"  # "zlib" deflates payloads that shrink by at least 10%; the receiver must support it
+BATCH_MAX_WRITES = 450  # Firestore allows 500 writes per batch commit
+BATCH_MAX_BYTES = 9 * 1024 * 1024  # commit requests are capped at 10 MiB; leave headroom for field names
+UPLOAD_MAX_WORKERS = 8
 
 db = None
 FIRESTORE_OK = False
 FIRESTORE_ERR = None
 
+@st.cache_resource(show_spinner=False)
+def get_firestore_client():
+    """Firestore client built once per process and shared across reruns/sessions (one app init, one gRPC channel)"""
+    # Get service account from Streamlit secrets
+    if not hasattr(st, "secrets") or "firebase_service_account" not in st.secrets:
+        raise RuntimeError("Add 'firebase_service_account' to Streamlit Secrets")
+    
+    service_account_info = st.secrets["firebase_service_account"]
+    
+    # Handle both dict and JSON string formats
+    if isinstance(service_account_info, str):
+        service_account_info = json.loads(service_account_info)
+    
+    # Fix newlines in private key
+    if "private_key" in service_account_info:
+        service_account_info["private_key"] = service_account_info["private_key"].replace("\\n", "\n")
+    
+    # Initialize Firebase app if not already done
+    try:
+        app = firebase_admin.get_app()
+    except ValueError:
+        cred = credentials.Certificate(service_account_info)
+        app = firebase_admin.initialize_app(cred)
+    
+    return firestore.client()
+
 def init_firestore():
     global db, FIRESTORE_OK, FIRESTORE_ERR
     
@@ -611,28 +821,7 @@ def init_firestore():
         return
     
     try:
-        # Get service account from Streamlit secrets
-        if not hasattr(st, "secrets") or "firebase_service_account" not in st.secrets:
-            raise RuntimeError("Add 'firebase_service_account' to Streamlit Secrets")
-        
-        service_account_info = st.secrets["firebase_service_account"]
-        
-        # Handle both dict and JSON string formats
-        if isinstance(service_account_info, str):
-            service_account_info = json.loads(service_account_info)
-        
-        # Fix newlines in private key
-        if "private_key" in service_account_info:
-            service_account_info["private_key"] = service_account_info["private_key"].replace("\\n", "\n")
-        
-        # Initialize Firebase app if not already done
-        try:
-            app = firebase_admin.get_app()
-        except ValueError:
-            cred = credentials.Certificate(service_account_info)
-            app = firebase_admin.initialize_app(cred)
-        
-        db = firestore.client()
+        db = get_firestore_client()
         FIRESTORE_OK = True
         set_status("Firestore initialized successfully")
         
@@ -646,9 +835,6 @@ def init_firestore():
 init_firestore()
 
 # --------- Utility Functions ----------
-def sha256_bytes(data: bytes) -> str:
-    return hashlib.sha256(data).hexdigest()
-
 def meta_doc_id(file_id: str) -> str:
     return f"{file_id}_meta"
 
@@ -677,6 +863,41 @@ def generate_upi_uri(upi_id: str, amount: float, note: str = None) -> str:
     return "upi://pay?" + "&".join(params)
 
 # --------- File Upload and Processing ----------
+def iter_chunks(data: bytes, chunk_size: int = CHUNK_SIZE, hasher=None):
+    """Lazily yield the chunk payloads for `data` in CHUNK_ENCODING, one chunk in memory at a time.
+
+    base64 pieces are encoded from 3-byte-aligned memoryview slices, so they concatenate to exactly b64encode(data).
+    If given, `hasher` is fed each raw slice, so hashing shares the pass over `data`.
+    """
+    view = memoryview(data)
+    step = chunk_size if CHUNK_ENCODING == "raw" else chunk_size // 4 * 3
+    for start in range(0, len(data), step):
+        piece = view[start:start + step]
+        if hasher is not None:
+            hasher.update(piece)
+        if CHUNK_ENCODING == "raw":
+            # The Firestore client only serializes bytes, not memoryview, so each slice is copied once here
+            yield bytes(piece)
+        else:
+            yield base64.b64encode(piece).decode('ascii')
+
+def chunk_count(size: int, chunk_size: int = CHUNK_SIZE) -> int:
+    """Number of chunks iter_chunks yields for `size` bytes"""
+    step = chunk_size if CHUNK_ENCODING == "raw" else chunk_size // 4 * 3
+    return -(-size // step)
+
+def group_chunk_batches(chunks):
+    """Group (chunk_index, chunk_data) pairs into lists that fit one Firestore batch commit"""
+    batch, batch_bytes = [], 0
+    for chunk_index, chunk_data in enumerate(chunks):
+        if batch and (len(batch) >= BATCH_MAX_WRITES or batch_bytes + len(chunk_data) > BATCH_MAX_BYTES):
+            yield batch
+            batch, batch_bytes = [], 0
+        batch.append((chunk_index, chunk_data))
+        batch_bytes += len(chunk_data)
+    if batch:
+        yield batch
+
 def upload_files_to_firestore(converted_files: List[ConvertedFile], job_settings: dict):
     """Upload files to Firestore with progress tracking"""
     
@@ -689,24 +910,35 @@ def upload_files_to_firestore(converted_files: List[ConvertedFile], job_settings
         return False
     
     try:
-        job_id = str(uuid.uuid4())[:12]
+        job_id = uuid.uuid4().hex[:12]
         set_status(f"Starting upload for job {job_id}")
         
         # Prepare file metadata
         files_metadata = []
         total_chunks = 0
         
-        for cf in converted_files:
-            file_id = str(uuid.uuid4())[:8]
+        valid_files = [cf for cf in converted_files if cf.pdf_bytes]
+        skipped = [cf.orig_name for cf in converted_files if not cf.pdf_bytes]
+        if skipped:
+            st.warning(f"⚠️ No PDF data for {', '.join(skipped)}, skipping")
+        
+        for file_index, cf in enumerate(valid_files):
+            # Unique by construction within the job; '-' keeps the '{file_id}_{suffix}' doc ids unambiguous
+            file_id = f"{job_id}-{file_index:04x}"
             pdf_data = cf.pdf_bytes
             
-            if not pdf_data:
-                st.warning(f"⚠️ No PDF data for {cf.orig_name}, skipping")
-                continue
+            payload, compression = pdf_data, "none"
+            if CHUNK_COMPRESSION == "zlib":
+                compressed = zlib.compress(pdf_data, 6)
+                if len(compressed) < 0.9 * len(pdf_data):
+                    payload, compression = compressed, "zlib"
             
-            # Convert to base64 and chunk
-            b64_data = base64.b64encode(pdf_data).decode('utf-8')
-            chunks = [b64_data[i:i+CHUNK_SIZE] for i in range(0, len(b64_data), CHUNK_SIZE)]
+            # Chunks are produced lazily at upload time; only the count is needed up front
+            total_file_chunks = chunk_count(len(payload))
+            hasher = hashlib.sha256()
+            if payload is not pdf_data:
+                # The digest is of the PDF itself, which the receiver gets back after decompressing
+                hasher.update(pdf_data)
             
             file_meta = {
                 "file_id": file_id,
@@ -723,14 +955,17 @@ def upload_files_to_firestore(converted_files: List[ConvertedFile], job_settings
                     "orientation": cf.settings.orientation,
                     "collate": cf.settings.collate
                 },
-                "chunks": chunks,
-                "total_chunks": len(chunks),
-                "sha256": sha256_bytes(pdf_data),
+                # Pricing flag parsed once here rather than from the settings string on every estimate
+                "is_duplex": "duplex" in cf.settings.duplex.lower() or "two" in cf.settings.duplex.lower(),
+                "compression": compression,
+                "chunks_iter": iter_chunks(payload, hasher=hasher if payload is pdf_data else None),
+                "sha256_hasher": hasher,  # complete once chunks_iter is exhausted
+                "total_chunks": total_file_chunks,
                 "job_id": job_id
             }
             
             files_metadata.append(file_meta)
-            total_chunks += len(chunks)
+            total_chunks += total_file_chunks
         
         if not files_metadata:
             st.error("❌ No valid files to upload after processing.")
@@ -741,57 +976,92 @@ def upload_files_to_firestore(converted_files: List[ConvertedFile], job_settings
         status_text = st.empty()
         uploaded_chunks = 0
         
-        # Upload chunks for each file
-        for file_meta in files_metadata:
-            file_id = file_meta["file_id"]
-            filename = file_meta["filename"]
-            
-            status_text.text(f"Uploading {filename}...")
+        # Upload chunks for each file, one batch commit per group instead of one round trip per chunk
+        meta_docs = {}
+        final_batches = {}  # file_id -> last batch, held back until the file's other batches are committed
+        pending = {}  # file_id -> other batches not yet committed
+        chunk_timestamp = datetime.datetime.now()  # one upload time for every chunk doc in the job
+        
+        def commit_chunk_batch(file_id: str, pairs: list, meta_doc: Optional[dict] = None):
+            # Runs on a worker thread: Firestore calls only, no Streamlit
+            batch = db.batch()
+            for chunk_index, chunk_data in pairs:
+                batch.set(db.collection(COLLECTION).document(chunk_doc_id(file_id, chunk_index)), {
+                    "data": chunk_data,
+                    "chunk_index": chunk_index,
+                    "file_id": file_id,
+                    "timestamp": chunk_timestamp
+                })
+            if meta_doc is not None:
+                # The meta doc rides in the file's last batch, so the receiver never sees it before every chunk
+                batch.set(db.collection(COLLECTION).document(meta_doc_id(file_id)), meta_doc, merge=True)
+            batch.commit(retry=FIRESTORE_RETRY)  # every write is a set(), so a retried commit is idempotent
+            return file_id, len(pairs), meta_doc is not None
+        
+        status_text.text(f"Uploading {len(files_metadata)} file(s)...")
+        
+        with ThreadPoolExecutor(max_workers=UPLOAD_MAX_WORKERS) as pool:
+            futures = set()
+            
+            def collect(done):
+                # Progress and status are updated here on the script thread as commits land
+                nonlocal uploaded_chunks
+                for future in done:
+                    file_id, written, was_last = future.result()
+                    uploaded_chunks += written
+                    progress_bar.progress(uploaded_chunks / total_chunks)
+                    
+                    if was_last:
+                        set_status(f"Uploaded {meta_docs[file_id]['file_name']} ({meta_docs[file_id]['total_chunks']} chunks)")
+                        continue
+                    
+                    pending[file_id] -= 1
+                    if pending[file_id] == 0 and file_id in final_batches:
+                        futures.add(pool.submit(commit_chunk_batch, file_id, final_batches.pop(file_id), meta_docs[file_id]))
             
-            # Upload file chunks
-            for chunk_index, chunk_data in enumerate(file_meta["chunks"]):
-                chunk_doc_id_str = chunk_doc_id(file_id, chunk_index)
+            for file_meta in files_metadata:
+                file_id = file_meta["file_id"]
+                meta_docs[file_id] = {
+                    "total_chunks": file_meta["total_chunks"],
+                    "encoding": CHUNK_ENCODING,
+                    "compression": file_meta["compression"],  # file_size_bytes stays the uncompressed PDF size
+                    "file_name": file_meta["filename"],
+                    "orig_filename": file_meta["orig_filename"],
+                    "sha256": None,  # filled in once every chunk has been produced
+                    "file_size_bytes": file_meta["size_bytes"],
+                    "pages": file_meta["pages"],
+                    "conversion_method": file_meta["conversion_method"],
+                    "settings": file_meta["settings"],
+                    "user_name": st.session_state.get("user_name", ""),
+                    "user_id": st.session_state.get("user_id", ""),
+                    "job_id": job_id,
+                    "timestamp": datetime.datetime.now(),
+                    "status": "uploaded"
+                }
+                pending[file_id] = 0
                 
-                def upload_chunk():
-                    doc_ref = db.collection(COLLECTION).document(chunk_doc_id_str)
-                    doc_ref.set({
-                        "data": chunk_data,
-                        "chunk_index": chunk_index,
-                        "file_id": file_id,
-                        "timestamp": datetime.datetime.now()
-                    })
+                # Submit each batch once the next one is known, so the last batch is always the one held back.
+                # The window bounds how many encoded batches are in memory at once.
+                held = None
+                for pairs in group_chunk_batches(file_meta["chunks_iter"]):
+                    if held is not None:
+                        while len(futures) >= UPLOAD_MAX_WORKERS * 2:
+                            done, futures = wait(futures, return_when=FIRST_COMPLETED)
+                            collect(done)
+                        pending[file_id] += 1
+                        futures.add(pool.submit(commit_chunk_batch, file_id, held))
+                    held = pairs
                 
-                retry_with_backoff(upload_chunk, attempts=3)
-                uploaded_chunks += 1
+                file_meta["sha256"] = meta_docs[file_id]["sha256"] = file_meta["sha256_hasher"].hexdigest()
                 
-                # Update progress
-                progress = uploaded_chunks / total_chunks
-                progress_bar.progress(progress)
-            
-            # Upload file metadata
-            meta_doc = {
-                "total_chunks": file_meta["total_chunks"],
-                "file_name": file_meta["filename"],
-                "orig_filename": file_meta["orig_filename"],
-                "sha256": file_meta["sha256"],
-                "file_size_bytes": file_meta["size_bytes"],
-                "pages": file_meta["pages"],
-                "conversion_method": file_meta["conversion_method"],
-                "settings": file_meta["settings"],
-                "user_name": st.session_state.get("user_name", ""),
-                "user_id": st.session_state.get("user_id", ""),
-                "job_id": job_id,
-                "timestamp": datetime.datetime.now(),
-                "status": "uploaded"
-            }
-            
-            def upload_metadata():
-                meta_doc_ref = db.collection(COLLECTION).document(meta_doc_id(file_id))
-                meta_doc_ref.set(meta_doc, merge=True)
-            
-            retry_with_backoff(upload_metadata, attempts=3)
+                if pending[file_id] == 0:
+                    futures.add(pool.submit(commit_chunk_batch, file_id, held, meta_docs[file_id]))
+                else:
+                    final_batches[file_id] = held
             
-            set_status(f"Uploaded {filename} ({file_meta['total_chunks']} chunks)")
+            while futures:
+                done, futures = wait(futures, return_when=FIRST_COMPLETED)
+                collect(done)
         
         progress_bar.progress(1.0)
         status_text.text("✅ Upload completed!")
@@ -806,49 +1076,65 @@ def upload_files_to_firestore(converted_files: List[ConvertedFile], job_settings
         st.error(f"❌ Upload failed: {str(e)}")
         return False
 
+POLL_TICK_SECONDS = 1.0  # how often the countdown is refreshed while waiting for the listener
+
 def poll_for_payment_info(files_metadata: List[dict], job_settings: dict):
-    """Poll Firestore for payment information from receiver"""
+    """Wait for payment information from receiver via Firestore snapshot listeners"""
     
     set_status("Waiting for payment information from receiver...")
     
     # Show local estimate first
     show_local_estimate(files_metadata, job_settings)
     
-    # Poll for official payment info
     poll_start = time.time()
     max_poll_time = 120  # 2 minutes
     
-    progress_container = st.container()
+    # One slot overwritten each tick, so the countdown doesn't stack a new message per second
+    countdown = st.empty()
     
-    while time.time() - poll_start < max_poll_time:
-        try:
-            # Check each file's metadata for payment info
-            for file_meta in files_metadata:
-                file_id = file_meta["file_id"]
-                
-                doc_ref = db.collection(COLLECTION).document(meta_doc_id(file_id))
-                doc_snapshot = doc_ref.get()
-                
-                if doc_snapshot.exists:
-                    doc_data = doc_snapshot.to_dict()
-                    
-                    if doc_data.get("payinfo"):
-                        st.session_state.payinfo = doc_data["payinfo"]
-                        set_status("✅ Received official payment information!")
-                        return
-            
-            # Update polling status
-            elapsed = int(time.time() - poll_start)
-            remaining = max_poll_time - elapsed
+    # Firestore pushes meta doc changes, so there are no repeated reads while the receiver is working
+    received = threading.Event()
+    payinfo_holder = {}
+    
+    def on_snapshot(doc_snapshots, changes, read_time):
+        # Runs on the listener thread: only record the result, Streamlit is updated below
+        for doc_snapshot in doc_snapshots:
+            if doc_snapshot.exists:
+                payinfo = (doc_snapshot.to_dict() or {}).get("payinfo")
+                if payinfo:
+                    payinfo_holder.setdefault("payinfo", payinfo)
+                    received.set()
+    
+    watches = []
+    try:
+        for file_meta in files_metadata:
+            doc_ref = db.collection(COLLECTION).document(meta_doc_id(file_meta["file_id"]))
+            watches.append(doc_ref.on_snapshot(on_snapshot))
+        
+        while not received.is_set():
+            remaining = max_poll_time - (time.time() - poll_start)
+            if remaining <= 0:
+                break
             
-            with progress_container:
-                st.info(f"⏳ Polling for payment info... ({remaining}s remaining)")
+            countdown.info(f"⏳ Waiting for payment info... ({int(remaining)}s remaining)")
             
-            time.sleep(2)
+            # Never wait past the deadline: the last tick is cut to whatever budget is left
+            received.wait(timeout=min(POLL_TICK_SECONDS, remaining))
             
-        except Exception as e:
-            logger.error(f"Polling error: {e}")
-            break
+    except Exception as e:
+        logger.error(f"Payment listener error: {e}")
+    finally:
+        countdown.empty()
+        for watch in watches:
+            try:
+                watch.unsubscribe()
+            except Exception as e:
+                logger.warning(f"Failed to stop payment listener: {e}")
+    
+    if received.is_set():
+        st.session_state.payinfo = payinfo_holder["payinfo"]
+        set_status("✅ Received official payment information!")
+        return
     
     # Timeout reached
     set_status("⚠️ Timeout waiting for official payment info. Using local estimate.")
@@ -859,23 +1145,15 @@ def show_local_estimate(files_metadata: List[dict], job_settings: dict):
     try:
         pricing = st.session_state.get("pricing", {})
         total_amount = 0.0
-        total_pages = 0
+        
+        # Job-wide settings; only duplex varies per file
+        copies = job_settings.get("copies", 1)
+        is_color = job_settings.get("is_color", True)
         
         for file_meta in files_metadata:
-            pages = file_meta["pages"]
-            copies = job_settings.get("copies", 1)
-            
-            # Determine if color printing
-            color_mode = job_settings.get("color_mode", "Color")
-            is_color = "color" in color_mode.lower()
-            
-            # Check for duplex
-            duplex_setting = file_meta["settings"].get("duplex", "Single-sided")
-            is_duplex = "duplex" in duplex_setting.lower() or "two" in duplex_setting.lower()
-            
-            file_amount = calculate_amount(pricing, pages, copies, is_color, is_duplex)
-            total_amount += file_amount
-            total_pages += pages * copies
+            total_amount += calculate_amount(pricing, file_meta["pages"], copies, is_color, file_meta["is_duplex"])
+        
+        total_pages = sum(file_meta["pages"] for file_meta in files_metadata) * copies
         
         # Create payment info object
         job_id = files_metadata[0]["job_id"]
@@ -886,7 +1164,7 @@ def show_local_estimate(files_metadata: List[dict], job_settings: dict):
             "file_name": file_name,
             "total_files": len(files_metadata),
             "pages": total_pages,
-            "copies": job_settings.get("copies", 1),
+            "copies": copies,
             "amount": round(total_amount, 2),
             "currency": pricing.get("currency", "INR"),
             "owner_upi": pricing.get("owner_upi", "owner@upi"),
@@ -901,6 +1179,17 @@ def show_local_estimate(files_metadata: List[dict], job_settings: dict):
         logger.error(f"Failed to create payment estimate: {e}")
 
 # --------- Payment Handling ----------
+@st.cache_data(max_entries=16, show_spinner=False)
+def upi_qr_svg(upi_uri: str) -> str:
+    """Render the payment QR code as SVG markup; the URI fully determines it, so renders are cached"""
+    qr = qrcode.QRCode(version=1, border=2)
+    qr.add_data(upi_uri)
+    qr.make(fit=True)
+    
+    # A single vector path, no rasterizing or PNG encoding; the white fill keeps it scannable on dark themes
+    qr_img = qr.make_image(image_factory=SvgPathFillImage)
+    return qr_img.to_string(encoding='unicode')
+
 def handle_online_payment():
     """Handle UPI online payment"""
     payinfo = st.session_state.get("payinfo")
@@ -927,31 +1216,24 @@ def handle_online_payment():
     # Generate QR code if available
     if QR_AVAILABLE:
         try:
-            qr = qrcode.QRCode(version=1, box_size=8, border=2)
-            qr.add_data(upi_uri)
-            qr.make(fit=True)
-            
-            qr_img = qr.make_image(fill_color="black", back_color="white")
-            
-            # Convert PIL image to bytes for Streamlit
-            img_buffer = io.BytesIO()
-            qr_img.save(img_buffer, format='PNG')
-            img_buffer.seek(0)
-            
-            st.image(img_buffer, width=250, caption="Scan with any UPI app")
+            st.image(upi_qr_svg(upi_uri), width=250, caption="Scan with any UPI app")
             
         except Exception as e:
             logger.warning(f"QR code generation failed: {e}")
     
-    # Try to open payment app automatically
-    try:
-        webbrowser.open(upi_uri)
-    except:
-        pass
+    # Try to open payment app automatically; the launcher can block, so it runs off the script thread
+    threading.Thread(target=open_payment_app, args=(upi_uri,), daemon=True).start()
     
     st.balloons()
     complete_payment_process()
 
+def open_payment_app(upi_uri: str):
+    """Best-effort hand-off of the UPI link to a local payment app"""
+    try:
+        webbrowser.open(upi_uri)
+    except Exception as e:
+        logger.debug(f"Could not open payment app: {e}")
+
 def handle_offline_payment():
     """Handle offline payment"""
     payinfo = st.session_state.get("payinfo")
@@ -979,8 +1261,23 @@ def cancel_payment():
     st.session_state.payinfo = None
     set_status("❌ Payment cancelled by user")
 
+def open_preview(index):
+    """Mark one converted file as open in the preview list (button callback)"""
+    st.session_state.open_preview = index
+
+def start_new_print_job():
+    """Reset session state for a new job (button callback, runs before the rerun)"""
+    st.session_state.converted_files = []
+    st.session_state.open_preview = -1
+    st.session_state.payinfo = None
+    st.session_state.process_complete = False
+    st.session_state.status = ""
+    st.session_state.user_id = str(uuid.uuid4())[:8]
+
 # --------- Main UI ----------
 
+ss = st.session_state  # bound once for the render pass
+
 # Sidebar for system information
 with st.sidebar:
     st.title("📋 System Info")
@@ -992,6 +1289,7 @@ with st.sidebar:
         st.write(f"**PDF Reader:** {'✅ Available' if PDF_READER_AVAILABLE else '❌ Not Available'}")
         st.write(f"**python-docx:** {'✅ Available' if PYTHON_DOCX_AVAILABLE else '❌ Not Available'}")
         st.write(f"**python-pptx:** {'✅ Available' if PYTHON_PPTX_AVAILABLE else '❌ Not Available'}")
+        st.write(f"**img2pdf:** {'✅ Available' if IMG2PDF_AVAILABLE else '❌ Not Available'}")
         st.write(f"**QR Code:** {'✅ Available' if QR_AVAILABLE else '❌ Not Available'}")
     
     # Supported formats
@@ -1014,15 +1312,15 @@ col1, col2 = st.columns([2, 1])
 with col1:
     user_name = st.text_input(
         "Your Name (Optional)", 
-        value=st.session_state.get("user_name", ""),
+        value=ss.get("user_name", ""),
         placeholder="Enter your name for the print job"
     )
-    st.session_state.user_name = user_name
+    ss.user_name = user_name
 
 with col2:
     st.text_input(
         "User ID", 
-        value=st.session_state.user_id, 
+        value=ss.user_id, 
         disabled=True,
         help="Unique identifier for your session"
     )
@@ -1047,9 +1345,14 @@ else:
             converted_files = []
             conversion_results = []
             
-            for uploaded_file in uploaded_files:
+            # Image decode/resize and zip inflate release the GIL, so files convert side by side;
+            # results are read back in upload order
+            with ThreadPoolExecutor(max_workers=min(CONVERT_MAX_WORKERS, len(uploaded_files))) as pool:
+                futures = [pool.submit(FileConverter.convert_uploaded_file_to_pdf, uploaded_file) for uploaded_file in uploaded_files]
+            
+            for uploaded_file, future in zip(uploaded_files, futures):
                 try:
-                    converted_file = FileConverter.convert_uploaded_file_to_pdf(uploaded_file)
+                    converted_file = future.result()
                     if converted_file:
                         converted_files.append(converted_file)
                         conversion_results.append({
@@ -1074,7 +1377,13 @@ else:
                         "pages": 0
                     })
             
-            st.session_state.converted_files = converted_files
+            ss.converted_files = converted_files
+            
+            # The block above runs on every rerun; only a different upload set closes the open preview
+            upload_key = tuple((f.name, f.size, getattr(f, "file_id", None)) for f in uploaded_files)
+            if ss.get("preview_upload_key") != upload_key:
+                ss.preview_upload_key = upload_key
+                ss.open_preview = -1
         
         # Show conversion results
         if conversion_results:
@@ -1096,8 +1405,15 @@ else:
         if converted_files:
             st.markdown("#### 👀 File Preview")
             
+            # Only the opened file ships its PDF bytes to the browser; the others are a label and a button
+            open_idx = ss.get("open_preview", -1)
             for i, cf in enumerate(converted_files):
-                with st.expander(f"📄 {cf.pdf_name} ({cf.pages} pages)"):
+                is_open = i == open_idx
+                with st.expander(f"📄 {cf.pdf_name} ({cf.pages} pages)", expanded=is_open):
+                    if not is_open:
+                        st.button("📂 Open", key=f"open_preview_{i}", on_click=open_preview, args=(i,))
+                        continue
+                    
                     col1, col2, col3 = st.columns([2, 1, 1])
                     
                     with col1:
@@ -1157,7 +1473,7 @@ else:
             
             # Calculate total pages and estimated cost
             total_pages = sum(cf.pages * copies for cf in converted_files)
-            pricing = st.session_state.pricing
+            pricing = ss.pricing
             
             is_color = "color" in color_mode.lower()
             estimated_cost = calculate_amount(pricing, total_pages, 1, is_color, False)
@@ -1168,6 +1484,7 @@ else:
             job_settings = {
                 "copies": copies,
                 "color_mode": color_mode,
+                "is_color": is_color,
                 "paper_size": paper_size
             }
             
@@ -1176,13 +1493,17 @@ else:
                 if success:
                     st.success("✅ Files uploaded successfully!")
 
+# Status and payment state, read once after the upload step may have changed them
+status = ss.get("status")
+payinfo = ss.get("payinfo")
+process_complete = ss.get("process_complete")
+
 # Status Display
-if st.session_state.get("status"):
-    st.info(f"📊 **Status:** {st.session_state.status}")
+if status:
+    st.info(f"📊 **Status:** {status}")
 
 # Payment Section
-payinfo = st.session_state.get("payinfo")
-if payinfo and not st.session_state.get("process_complete"):
+if payinfo and not process_complete:
     st.markdown("---")
     st.markdown("### 💳 Payment Required")
     
@@ -1218,20 +1539,13 @@ if payinfo and not st.session_state.get("process_complete"):
             if st.button("❌ Cancel", use_container_width=True):
                 cancel_payment()
 
-# Process Complete Section
-if st.session_state.get("process_complete"):
+# Process Complete Section (re-read: the payment buttons above can complete the job in this run)
+if ss.get("process_complete"):
     st.markdown("---")
     st.success("🎉 **Print job submitted successfully!**")
     st.info("Your files have been sent to the print shop. Please proceed with payment and collect your prints.")
     
-    if st.button("🔄 Start New Print Job", type="primary"):
-        # Reset session state for new job
-        st.session_state.converted_files = []
-        st.session_state.payinfo = None
-        st.session_state.process_complete = False
-        st.session_state.status = ""
-        st.session_state.user_id = str(uuid.uuid4())[:8]
-        st.rerun()
+    st.button("🔄 Start New Print Job", type="primary", on_click=start_new_print_job)
 
 # Footer
 st.markdown("---")
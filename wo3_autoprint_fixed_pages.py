@@ -182,6 +182,8 @@ class ConvertedFile:
     pdf_bytes: bytes
     settings: PrintSettings
     original_bytes: Optional[bytes] = None  # saved original upload bytes for fallback
+    mime: str = "application/pdf"  # download mime, resolved once at ingest
+    pages: int = 0  # page count of the blob that will be sent, resolved once at ingest
 
 # --------- FileConverter (unchanged) ----------
 class FileConverter:
@@ -570,6 +572,8 @@ st.markdown(
 # Initialize session state containers
 if 'converted_files_pm' not in st.session_state:
     st.session_state.converted_files_pm = []
+if 'removed_files_pm' not in st.session_state:
+    st.session_state.removed_files_pm = set()  # names removed from the queue while still in the uploader
 if 'converted_files_conv' not in st.session_state:
     st.session_state.converted_files_conv = []
 if 'formatted_pdfs' not in st.session_state:
@@ -687,8 +691,8 @@ def send_multiple_files(converted_files: List[ConvertedFile], copies: int, color
         for cf in converted_files:
             blob = cf.pdf_bytes if cf.pdf_bytes else (cf.original_bytes or b"")
             size = len(blob)
-            # USE helper to count pages correctly
-            pages = count_pdf_pages(blob)
+            # page count was resolved with the same helper when the file was queued
+            pages = cf.pages
             file_id = str(uuid.uuid4())[:8]
             files_meta.append({
                 "file_id": file_id,
@@ -828,6 +832,21 @@ def pay_online():
     st.session_state["payinfo"] = None
     st.session_state["process_complete"] = True
 
+def remove_from_queue(orig_name: str):
+    st.session_state.converted_files_pm = [x for x in st.session_state.converted_files_pm if x.orig_name != orig_name]
+    st.session_state.pop(f"sel_file_{orig_name}", None)
+    # The file is still in the uploader; without this the next rerun's ingest would add it back
+    st.session_state.removed_files_pm.add(orig_name)
+    set_status(f"Removed {orig_name} from queue")
+
+def start_new_transfer():
+    st.session_state["process_complete"] = False
+    st.session_state["payinfo"] = None
+    st.session_state["status"] = ""
+    st.session_state["print_ack"] = None
+    st.session_state["user_id"] = str(uuid.uuid4())[:8]
+    set_status("Ready for new transfer")
+
 def cancel_payment():
     close_sock()
     st.session_state["payinfo"] = None
@@ -847,19 +866,27 @@ def render_print_manager_page():
 
     # multi-upload
     uploaded = st.file_uploader("📁 Upload files to add to queue (multiple)", accept_multiple_files=True, type=['pdf','txt','md','rtf','html','htm','png','jpg','jpeg','bmp','tiff','webp','docx','pptx'], key="pm_multi_upload")
+    # Forget removals once the file leaves the uploader, so uploading it again re-queues it
+    removed = st.session_state.removed_files_pm
+    removed.intersection_update(uf.name for uf in uploaded or [])
     if uploaded:
         with st.spinner("Converting and storing..."):
             conv_list = st.session_state.get("converted_files_pm", [])
             for uf in uploaded:
-                if any(x.orig_name == uf.name for x in conv_list):
+                if uf.name in removed or any(x.orig_name == uf.name for x in conv_list):
                     continue
                 try:
                     original_bytes = uf.getvalue()
                     pdf_bytes = FileConverter.convert_uploaded_file_to_pdf_bytes(uf)
+                    if pdf_bytes == original_bytes:
+                        # PDF passthrough: keep one buffer per file instead of two identical copies
+                        pdf_bytes = original_bytes
                     if pdf_bytes:
-                        cf = ConvertedFile(orig_name=uf.name, pdf_name=os.path.splitext(uf.name)[0] + ".pdf", pdf_bytes=pdf_bytes, settings=PrintSettings(), original_bytes=original_bytes)
+                        cf = ConvertedFile(orig_name=uf.name, pdf_name=os.path.splitext(uf.name)[0] + ".pdf", pdf_bytes=pdf_bytes, settings=PrintSettings(), original_bytes=original_bytes,
+                                           pages=count_pdf_pages(pdf_bytes))
                     else:
-                        cf = ConvertedFile(orig_name=uf.name, pdf_name=uf.name, pdf_bytes=b"", settings=PrintSettings(), original_bytes=original_bytes)
+                        cf = ConvertedFile(orig_name=uf.name, pdf_name=uf.name, pdf_bytes=b"", settings=PrintSettings(), original_bytes=original_bytes,
+                                           mime="application/octet-stream", pages=count_pdf_pages(original_bytes))
                     conv_list.append(cf)
                 except Exception as e:
                     log(f"Conversion on upload failed for {uf.name}: {e}", "warning")
@@ -875,11 +902,11 @@ def render_print_manager_page():
         for idx, cf in enumerate(conv):
             cols = st.columns([4,1,1,1])
             with cols[0]:
-                checked_key = f"sel_file_{idx}"
+                checked_key = f"sel_file_{cf.orig_name}"
                 if checked_key not in st.session_state:
                     st.session_state[checked_key] = True
                 st.checkbox(f"{cf.pdf_name} (orig: {cf.orig_name})", value=st.session_state[checked_key], key=checked_key)
-                if st.button(f"Preview {idx}", key=f"preview_pm_{idx}"):
+                if st.button(f"Preview {idx}", key=f"preview_pm_{cf.orig_name}"):
                     if cf.pdf_bytes:
                         b64 = base64.b64encode(cf.pdf_bytes).decode('utf-8')
                         ts = int(time.time()*1000)
@@ -900,24 +927,17 @@ def render_print_manager_page():
                     else:
                         st.warning("No converted PDF available for preview; original bytes will be sent instead.")
             with cols[1]:
-                if st.button("Download", key=f"dl_pm_{idx}"):
-                    if cf.pdf_bytes:
-                        st.download_button("Download PDF", data=cf.pdf_bytes, file_name=cf.pdf_name, mime="application/pdf", key=f"dlpdf_{idx}")
-                    else:
-                        st.download_button("Download original", data=cf.original_bytes or b"", file_name=cf.orig_name, mime="application/octet-stream", key=f"dlorig_{idx}")
+                if cf.pdf_bytes:
+                    st.download_button("Download", data=cf.pdf_bytes, file_name=cf.pdf_name, mime=cf.mime, key=f"dlpdf_{cf.orig_name}")
+                else:
+                    st.download_button("Download original", data=cf.original_bytes or b"", file_name=cf.orig_name, mime=cf.mime, key=f"dlorig_{cf.orig_name}")
             with cols[2]:
-                if st.button("Remove", key=f"rm_pm_{idx}"):
-                    new_list = [x for x in st.session_state.converted_files_pm if x.orig_name != cf.orig_name]
-                    st.session_state.converted_files_pm = new_list
-                    set_status(f"Removed {cf.orig_name} from queue")
+                st.button("Remove", key=f"rm_pm_{cf.orig_name}", on_click=remove_from_queue, args=(cf.orig_name,))
             with cols[3]:
-                # use helper to count pages for the display as well
-                blob_for_count = cf.pdf_bytes if cf.pdf_bytes else (cf.original_bytes or b'')
-                pages = count_pdf_pages(blob_for_count)
-                st.caption(f"{pages}p")
+                st.caption(f"{cf.pages}p")
 
         # gather selected
-        selected_files = [cf for idx,cf in enumerate(conv) if st.session_state.get(f"sel_file_{idx}", True)]
+        selected_files = [cf for cf in conv if st.session_state.get(f"sel_file_{cf.orig_name}", True)]
 
         st.markdown("---")
         st.markdown("### 🖨️ Job-level Print Settings")
@@ -964,13 +984,7 @@ def render_print_manager_page():
     if st.session_state.get("process_complete"):
         st.success("🎉 **Process Complete!**")
         st.write("Thank you for using our file transfer and print service.")
-        if st.button("🔄 Start New Transfer"):
-            st.session_state["process_complete"] = False
-            st.session_state["payinfo"] = None
-            st.session_state["status"] = ""
-            st.session_state["print_ack"] = None
-            st.session_state["user_id"] = str(uuid.uuid4())[:8]
-            set_status("Ready for new transfer")
+        st.button("🔄 Start New Transfer", on_click=start_new_transfer)
 
 # Convert & Format page (unchanged)
 def render_convert_page():
@@ -990,7 +1004,6 @@ def render_convert_page():
                         "orig_name": uf.name,
                         "pdf_name": os.path.splitext(uf.name)[0] + ".pdf",
                         "pdf_bytes": pdf_bytes,
-                        "pdf_base64": base64.b64encode(pdf_bytes).decode('utf-8')
                     })
                 else:
                     st.error(f"Failed: {uf.name}")
@@ -1005,7 +1018,7 @@ def render_convert_page():
             cols[0].write(f"**{it['pdf_name']}**")
             cols[0].caption(it['orig_name'])
             if cols[1].button("Preview", key=f"c_preview_{i}"):
-                b64 = it['pdf_base64']; ts=int(time.time()*1000)
+                b64 = base64.b64encode(it['pdf_bytes']).decode('utf-8'); ts=int(time.time()*1000)
                 js=f"""
                 <script>
                 (function(){{
@@ -1021,7 +1034,7 @@ def render_convert_page():
                 """
                 components.html(js, height=0)
             if cols[2].button("Format & Print", key=f"c_format_{i}"):
-                b64 = it['pdf_base64']; ts=int(time.time()*1000)
+                b64 = base64.b64encode(it['pdf_bytes']).decode('utf-8'); ts=int(time.time()*1000)
                 js=f"""
                 <script>
                 (function(){{
@@ -21,13 +21,20 @@ from PIL import Image
 from pathlib import Path
 import hashlib
 import datetime
-import uuid
+import secrets
 import webbrowser
 import io
 import zipfile
+import posixpath
 import xml.etree.ElementTree as ET
 import re
-import html
+from html.parser import HTMLParser
+import functools
+import importlib
+import importlib.util
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 
 # Enhanced PDF libraries (cloud-compatible)
 try:
@@ -48,22 +55,48 @@ except ImportError:
 # Skip WeasyPrint due to system dependency issues on cloud platforms
 WEASYPRINT_AVAILABLE = False
 
+# Per-format libraries (mammoth, markdown, python-docx, python-pptx, qrcode, pypdf) are only probed here;
+# lazy_import() loads each one the first time a session actually needs it, keeping cold start light
+def module_available(name: str) -> bool:
+    """Check an optional dependency is installed without importing it"""
+    return importlib.util.find_spec(name) is not None
+
+@functools.cache
+def lazy_import(name: str):
+    """Import an optional module on first use"""
+    return importlib.import_module(name)
+
+MAMMOTH_AVAILABLE = module_available("mammoth")
+
+# Enhanced Markdown processing
+MARKDOWN_AVAILABLE = module_available("markdown")
+
+# Hardened XML parsing for uploaded DOCX parts (same expat parser, entity/DTD attacks rejected)
 try:
-    import mammoth
-    MAMMOTH_AVAILABLE = True
+    from defusedxml.ElementTree import iterparse as xml_iterparse, fromstring as xml_fromstring
+    DEFUSEDXML_AVAILABLE = True
 except ImportError:
-    MAMMOTH_AVAILABLE = False
+    xml_iterparse = ET.iterparse
+    xml_fromstring = ET.fromstring
+    DEFUSEDXML_AVAILABLE = False
 
-# Enhanced Markdown processing
+# Byte-level charset detection for non-UTF-8 text uploads
+try:
+    from charset_normalizer import from_bytes as detect_charset
+    CHARSET_NORMALIZER_AVAILABLE = True
+except ImportError:
+    CHARSET_NORMALIZER_AVAILABLE = False
+
+# Faster JSON pretty-printing for .json uploads
 try:
-    import markdown
-    MARKDOWN_AVAILABLE = True
+    import orjson
+    ORJSON_AVAILABLE = True
 except ImportError:
-    MARKDOWN_AVAILABLE = False
+    ORJSON_AVAILABLE = False
 
 # HTML to text conversion
 try:
-    from bs4 import BeautifulSoup
+    from bs4 import BeautifulSoup, Comment, Doctype
     BS4_AVAILABLE = True
 except ImportError:
     BS4_AVAILABLE = False
@@ -82,40 +115,23 @@ except ImportError:
     firestore = None
     FIRESTORE_AVAILABLE = False
 
-# PDF processing
-try:
-    from pypdf import PdfReader
-    PDF_READER_AVAILABLE = True
-except ImportError:
-    try:
-        from PyPDF2 import PdfReader
-        PDF_READER_AVAILABLE = True
-    except ImportError:
-        PdfReader = None
-        PDF_READER_AVAILABLE = False
+# PDF processing (only needed when the byte scan in count_pdf_pages can't answer)
+if module_available("pypdf"):
+    PDF_READER_MODULE = "pypdf"
+elif module_available("PyPDF2"):
+    PDF_READER_MODULE = "PyPDF2"
+else:
+    PDF_READER_MODULE = None
+PDF_READER_AVAILABLE = PDF_READER_MODULE is not None
 
 # QR generation
-try:
-    import qrcode
-    QR_AVAILABLE = True
-except ImportError:
-    QR_AVAILABLE = False
+QR_AVAILABLE = module_available("qrcode")
 
 # python-docx for DOCX text extraction
-try:
-    import docx as python_docx
-    PYTHON_DOCX_AVAILABLE = True
-except ImportError:
-    python_docx = None
-    PYTHON_DOCX_AVAILABLE = False
+PYTHON_DOCX_AVAILABLE = module_available("docx")
 
 # python-pptx for PPTX text extraction
-try:
-    from pptx import Presentation as PptxPresentation
-    PYTHON_PPTX_AVAILABLE = True
-except ImportError:
-    PptxPresentation = None
-    PYTHON_PPTX_AVAILABLE = False
+PYTHON_PPTX_AVAILABLE = module_available("pptx")
 
 # --------- Enhanced Logging ----------
 def setup_logger():
@@ -192,9 +208,203 @@ class ConvertedFile:
     pdf_name: str
     pdf_bytes: bytes
     settings: PrintSettings
-    original_bytes: Optional[bytes] = None
+    original_bytes: Optional[bytes] = None  # only set for PDF passthrough, where it is the same object as pdf_bytes
     conversion_method: str = "unknown"
     pages: int = 1
+    sha256: Optional[str] = None  # hex digest of pdf_bytes, computed once at conversion
+
+# --------- FPDF helpers ----------
+def to_latin1(text: str) -> str:
+    """Core FPDF fonts only cover latin-1; replace anything else up front"""
+    return text.encode('latin-1', 'replace').decode('latin-1')
+
+def fpdf_output_bytes(pdf) -> bytes:
+    """PDF bytes from fpdf2 (output() is already a bytearray) or PyFPDF 1.x (latin-1 str)"""
+    out = pdf.output(dest='S')
+    if isinstance(out, (bytes, bytearray)):
+        return bytes(out)
+    return out.encode('latin-1', errors='replace')
+
+# --------- Image helpers ----------
+def draft_within(img: Image.Image, max_dimension: int) -> bool:
+    """Let libjpeg decode an oversized JPEG at 1/2, 1/4 or 1/8 scale (no-op for other formats); True if the size changed"""
+    scale = max(img.width, img.height) / max_dimension
+    if scale < 2:
+        return False
+    full_size = img.size
+    img.draft('RGB', (int(img.width / scale), int(img.height / scale)))
+    return img.size != full_size
+
+def fit_within(img: Image.Image, max_dimension: int) -> Image.Image:
+    """Shrink `img` to fit max_dimension: cheap integer box reduce() first, LANCZOS only for the remainder"""
+    factor = max(img.width, img.height) // max_dimension
+    if factor >= 2:
+        img = img.reduce(factor)
+    img.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+    return img
+
+# --------- Conversion cache ----------
+CONVERSION_CACHE_MAX_BYTES = 64 * 1024 * 1024  # shared by every session in the process, so bounded by size
+_conversion_cache: "OrderedDict[tuple, bytes]" = OrderedDict()
+_conversion_cache_bytes = 0
+_conversion_cache_lock = threading.Lock()
+
+def cached_conversion(func):
+    """Memoize the top-level convert classmethod on (blake2b(content), filename) so Streamlit reruns skip reconversion.
+
+    Applied only at the entry point, so a DOCX/PPTX that goes through convert_text_file is stored once.
+    Converters raise on failure instead of returning an error PDF, so a transient error is never
+    stored; convert_uploaded_file_to_pdf builds the error PDF outside the cache.
+    """
+    @functools.wraps(func)
+    def wrapper(cls, file_content: bytes, filename: str) -> Optional[bytes]:
+        global _conversion_cache_bytes
+        key = (func.__name__, hashlib.blake2b(file_content, digest_size=16).digest(), filename)
+        with _conversion_cache_lock:
+            cached = _conversion_cache.get(key)
+            if cached is not None:
+                _conversion_cache.move_to_end(key)
+                return cached
+
+        pdf_bytes = func(cls, file_content, filename)
+
+        # Exceptions propagate before this point and None is skipped, so only real conversions are stored;
+        # a single PDF larger than the whole budget is returned uncached
+        if pdf_bytes and len(pdf_bytes) <= CONVERSION_CACHE_MAX_BYTES:
+            with _conversion_cache_lock:
+                if key not in _conversion_cache:
+                    _conversion_cache[key] = pdf_bytes
+                    _conversion_cache_bytes += len(pdf_bytes)
+                _conversion_cache.move_to_end(key)
+                while _conversion_cache_bytes > CONVERSION_CACHE_MAX_BYTES:
+                    _, evicted = _conversion_cache.popitem(last=False)
+                    _conversion_cache_bytes -= len(evicted)
+        return pdf_bytes
+    return wrapper
+
+# --------- HTML to text fallback (no BeautifulSoup) ----------
+_RE_BLANK_LINES = re.compile(r'\n\s*\n')
+_HEADER_LEVELS = {f'h{i}': i for i in range(1, 7)}
+
+class _HTMLTextEmitter(HTMLParser):
+    """Single-pass HTML -> markdown-ish text, mirroring the BeautifulSoup walk in html_to_text"""
+    
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._skip_depth = 0  # inside <script>/<style>
+    
+    def handle_starttag(self, tag, attrs):
+        if tag in ('script', 'style'):
+            self._skip_depth += 1
+        elif self._skip_depth:
+            return
+        elif tag in _HEADER_LEVELS:
+            self.parts.append(f"\n\n{'#' * _HEADER_LEVELS[tag]} ")
+        elif tag == 'br':
+            self.parts.append('\n')
+        elif tag == 'li':
+            self.parts.append('• ')
+    
+    def handle_endtag(self, tag):
+        if tag in ('script', 'style'):
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif self._skip_depth:
+            return
+        elif tag in _HEADER_LEVELS or tag == 'p':
+            self.parts.append('\n\n')
+        elif tag == 'li':
+            self.parts.append('\n')
+    
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.parts.append(data)
+
+# --------- Cached ReportLab styles ----------
+@functools.lru_cache(maxsize=1)
+def enhanced_text_styles():
+    """Paragraph styles for create_text_pdf_reportlab_enhanced, built once per process"""
+    styles = getSampleStyleSheet()
+
+    # Custom title style
+    title_style = ParagraphStyle(
+        'EnhancedTitle',
+        parent=styles['Heading1'],
+        fontSize=18,
+        spaceAfter=30,
+        spaceBefore=20,
+        textColor=colors.darkblue,
+        alignment=TA_CENTER,
+        fontName='Helvetica-Bold'
+    )
+
+    # Custom header styles
+    header1_style = ParagraphStyle(
+        'EnhancedHeader1',
+        parent=styles['Heading1'],
+        fontSize=14,
+        spaceAfter=12,
+        spaceBefore=20,
+        textColor=colors.darkslategray,
+        fontName='Helvetica-Bold'
+    )
+
+    header2_style = ParagraphStyle(
+        'EnhancedHeader2',
+        parent=styles['Heading2'],
+        fontSize=12,
+        spaceAfter=8,
+        spaceBefore=16,
+        textColor=colors.darkslategray,
+        fontName='Helvetica-Bold'
+    )
+
+    # Enhanced normal style
+    normal_style = ParagraphStyle(
+        'EnhancedNormal',
+        parent=styles['Normal'],
+        fontSize=10,
+        spaceAfter=6,
+        textColor=colors.black,
+        fontName='Helvetica',
+        alignment=TA_JUSTIFY,
+        leading=12
+    )
+
+    # Code/monospace style
+    code_style = ParagraphStyle(
+        'EnhancedCode',
+        parent=styles['Normal'],
+        fontSize=9,
+        spaceAfter=6,
+        textColor=colors.darkgreen,
+        fontName='Courier',
+        backColor=colors.lightgrey,
+        borderColor=colors.grey,
+        borderWidth=0.5,
+        borderPadding=6
+    )
+
+    # List style
+    list_style = ParagraphStyle(
+        'EnhancedList',
+        parent=normal_style,
+        leftIndent=20,
+        bulletIndent=10
+    )
+    
+    return title_style, header1_style, header2_style, normal_style, code_style, list_style
+
+@functools.lru_cache(maxsize=1)
+def image_title_style():
+    """Caption style for convert_image_file_reportlab, built once per process"""
+    return ParagraphStyle(
+        'ImageTitle',
+        parent=getSampleStyleSheet()['Title'],
+        fontSize=14,
+        spaceAfter=20,
+        alignment=TA_CENTER
+    )
 
 # --------- Cloud-Compatible Enhanced FileConverter ----------
 class CloudCompatibleFileConverter:
@@ -202,6 +412,24 @@ class CloudCompatibleFileConverter:
     
     SUPPORTED_TEXT_EXTENSIONS = {'.txt', '.md', '.rtf', '.html', '.htm', '.csv', '.log', '.xml', '.json'}
     SUPPORTED_IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.bmp', '.tiff', '.tif', '.webp', '.gif'}
+    PPTX_TITLE_PLACEHOLDER = 1  # PP_PLACEHOLDER.TITLE, without importing pptx.enum up front
+    PPTX_NS = {
+        'p': 'http://schemas.openxmlformats.org/presentationml/2006/main',
+        'a': 'http://schemas.openxmlformats.org/drawingml/2006/main',
+        'r': 'http://schemas.openxmlformats.org/officeDocument/2006/relationships',
+    }
+    PACKAGE_RELS_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+    DOCX_W_VAL = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}val'
+    DOCX_MC_FALLBACK = '{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback'
+    NO_SLIDE_TEXT = "\n\n(No text content on this slide)"
+    
+    # suffix -> (converter method name, conversion_method label); one dict lookup per upload
+    CONVERTERS: Dict[str, tuple] = {
+        **{ext: ('convert_text_file', 'enhanced_text') for ext in SUPPORTED_TEXT_EXTENSIONS},
+        **{ext: ('convert_image_file', 'enhanced_image') for ext in SUPPORTED_IMAGE_EXTENSIONS},
+        '.docx': ('convert_docx_file', 'enhanced_docx'),
+        '.pptx': ('convert_pptx_file', 'enhanced_pptx'),
+    }
     
     @staticmethod
     def html_to_text(html_content: str) -> str:
@@ -209,43 +437,39 @@ class CloudCompatibleFileConverter:
         try:
             if BS4_AVAILABLE:
                 soup = BeautifulSoup(html_content, 'html.parser')
+                out = []
                 
-                # Handle different HTML elements
-                for elem in soup.find_all(['script', 'style']):
-                    elem.decompose()
-                
-                # Convert headers
-                for i in range(1, 7):
-                    for header in soup.find_all(f'h{i}'):
-                        header.insert_before('\n\n')
-                        header.insert_after('\n\n')
-                        header.string = f"{'#' * i} {header.get_text()}"
-                
-                # Convert paragraphs
-                for p in soup.find_all('p'):
-                    p.insert_after('\n\n')
-                
-                # Convert line breaks
-                for br in soup.find_all('br'):
-                    br.replace_with('\n')
-                
-                # Convert lists
-                for li in soup.find_all('li'):
-                    li.insert_before('• ')
-                    li.insert_after('\n')
+                # Single walk that emits text pieces; the tree is never mutated
+                def walk(node):
+                    for child in node.children:
+                        name = getattr(child, 'name', None)
+                        if name is None:
+                            if not isinstance(child, (Comment, Doctype)):
+                                out.append(str(child))
+                        elif name in ('script', 'style'):
+                            continue
+                        elif name in _HEADER_LEVELS:
+                            out.append(f"\n\n{'#' * _HEADER_LEVELS[name]} {child.get_text()}\n\n")
+                        elif name == 'br':
+                            out.append('\n')
+                        elif name == 'li':
+                            out.append('• ')
+                            walk(child)
+                            out.append('\n')
+                        elif name == 'p':
+                            walk(child)
+                            out.append('\n\n')
+                        else:
+                            walk(child)
                 
-                return soup.get_text()
+                walk(soup)
+                return ''.join(out)
             else:
-                # Basic HTML cleaning without BeautifulSoup
-                text = re.sub(r'<script[^>]*>.*?</script>', '', html_content, flags=re.DOTALL | re.IGNORECASE)
-                text = re.sub(r'<style[^>]*>.*?</style>', '', text, flags=re.DOTALL | re.IGNORECASE)
-                text = re.sub(r'<h[1-6][^>]*>(.*?)</h[1-6]>', r'\n\n# \1\n\n', text)
-                text = re.sub(r'<p[^>]*>(.*?)</p>', r'\1\n\n', text)
-                text = re.sub(r'<br[^>]*/?>', '\n', text)
-                text = re.sub(r'<li[^>]*>(.*?)</li>', r'• \1\n', text)
-                text = re.sub(r'<[^>]+>', '', text)
-                text = html.unescape(text)
-                return re.sub(r'\n\s*\n', '\n\n', text).strip()
+                # Basic HTML cleaning without BeautifulSoup: one tokenizer pass instead of a regex cascade
+                emitter = _HTMLTextEmitter()
+                emitter.feed(html_content)
+                emitter.close()
+                return _RE_BLANK_LINES.sub('\n\n', ''.join(emitter.parts)).strip()
         except Exception as e:
             logger.error(f"HTML to text conversion failed: {e}")
             return html_content
@@ -267,75 +491,8 @@ class CloudCompatibleFileConverter:
                 bottomMargin=72
             )
             
-            # Enhanced styles
-            styles = getSampleStyleSheet()
-            
-            # Custom title style
-            title_style = ParagraphStyle(
-                'EnhancedTitle',
-                parent=styles['Heading1'],
-                fontSize=18,
-                spaceAfter=30,
-                spaceBefore=20,
-                textColor=colors.darkblue,
-                alignment=TA_CENTER,
-                fontName='Helvetica-Bold'
-            )
-            
-            # Custom header styles
-            header1_style = ParagraphStyle(
-                'EnhancedHeader1',
-                parent=styles['Heading1'],
-                fontSize=14,
-                spaceAfter=12,
-                spaceBefore=20,
-                textColor=colors.darkslategray,
-                fontName='Helvetica-Bold'
-            )
-            
-            header2_style = ParagraphStyle(
-                'EnhancedHeader2',
-                parent=styles['Heading2'],
-                fontSize=12,
-                spaceAfter=8,
-                spaceBefore=16,
-                textColor=colors.darkslategray,
-                fontName='Helvetica-Bold'
-            )
-            
-            # Enhanced normal style
-            normal_style = ParagraphStyle(
-                'EnhancedNormal',
-                parent=styles['Normal'],
-                fontSize=10,
-                spaceAfter=6,
-                textColor=colors.black,
-                fontName='Helvetica',
-                alignment=TA_JUSTIFY,
-                leading=12
-            )
-            
-            # Code/monospace style
-            code_style = ParagraphStyle(
-                'EnhancedCode',
-                parent=styles['Normal'],
-                fontSize=9,
-                spaceAfter=6,
-                textColor=colors.darkgreen,
-                fontName='Courier',
-                backColor=colors.lightgrey,
-                borderColor=colors.grey,
-                borderWidth=0.5,
-                borderPadding=6
-            )
-            
-            # List style
-            list_style = ParagraphStyle(
-                'EnhancedList',
-                parent=normal_style,
-                leftIndent=20,
-                bulletIndent=10
-            )
+            # Enhanced styles (built once, reused across conversions)
+            title_style, header1_style, header2_style, normal_style, code_style, list_style = enhanced_text_styles()
             
             # Build document
             story = []
@@ -344,86 +501,57 @@ class CloudCompatibleFileConverter:
             story.append(Paragraph(title, title_style))
             story.append(Spacer(1, 20))
             
-            # Process content
-            lines = text.split('\n')
+            # Line prefix -> (chars to strip, style, text prefix); '## ' is looked up before the 2-char keys
+            line_rules = {
+                '## ': (3, header2_style, ''),
+                '# ': (2, header1_style, ''),
+                '• ': (2, list_style, '• '),
+                '- ': (2, list_style, '• '),
+                '* ': (2, list_style, '• '),
+            }
             current_paragraph = []
             in_code_block = False
             
-            for line in lines:
+            def flush():
+                if current_paragraph:
+                    para_text = ' '.join(current_paragraph)
+                    if para_text.strip():
+                        story.append(Paragraph(para_text, normal_style))
+                    current_paragraph.clear()
+            
+            # Process content in a single pass
+            for line in text.split('\n'):
                 line = line.rstrip()
                 
                 # Handle code blocks
-                if line.startswith('```') or line.startswith('~~~'):
-                    if current_paragraph:
-                        para_text = ' '.join(current_paragraph)
-                        if para_text.strip():
-                            story.append(Paragraph(para_text, normal_style))
-                        current_paragraph = []
-                    
+                if line.startswith(('```', '~~~')):
+                    flush()
                     in_code_block = not in_code_block
                     continue
                 
                 if in_code_block:
-                    if line.strip():
-                        story.append(Paragraph(line, code_style))
-                    else:
-                        story.append(Spacer(1, 6))
-                    continue
-                
-                # Handle headers
-                if line.startswith('# '):
-                    if current_paragraph:
-                        para_text = ' '.join(current_paragraph)
-                        if para_text.strip():
-                            story.append(Paragraph(para_text, normal_style))
-                        current_paragraph = []
-                    
-                    header_text = line[2:].strip()
-                    story.append(Paragraph(header_text, header1_style))
+                    story.append(Paragraph(line, code_style) if line.strip() else Spacer(1, 6))
                     continue
                 
-                elif line.startswith('## '):
-                    if current_paragraph:
-                        para_text = ' '.join(current_paragraph)
-                        if para_text.strip():
-                            story.append(Paragraph(para_text, normal_style))
-                        current_paragraph = []
-                    
-                    header_text = line[3:].strip()
-                    story.append(Paragraph(header_text, header2_style))
-                    continue
+                # Headers and lists
+                rule = line_rules.get(line[:3]) or line_rules.get(line[:2])
+                if rule:
+                    cut, style, prefix = rule
+                    flush()
+                    story.append(Paragraph(prefix + line[cut:].strip(), style))
                 
-                # Handle lists
-                elif line.startswith('• ') or line.startswith('- ') or line.startswith('* '):
-                    if current_paragraph:
-                        para_text = ' '.join(current_paragraph)
-                        if para_text.strip():
-                            story.append(Paragraph(para_text, normal_style))
-                        current_paragraph = []
-                    
-                    list_text = line[2:].strip()
-                    story.append(Paragraph(f"• {list_text}", list_style))
-                    continue
-                
-                # Handle empty lines
+                # Empty lines end the current paragraph
                 elif not line.strip():
                     if current_paragraph:
-                        para_text = ' '.join(current_paragraph)
-                        if para_text.strip():
-                            story.append(Paragraph(para_text, normal_style))
-                        current_paragraph = []
+                        flush()
                         story.append(Spacer(1, 6))
-                    continue
                 
                 # Regular text
                 else:
                     current_paragraph.append(line)
             
             # Don't forget the last paragraph
-            if current_paragraph:
-                para_text = ' '.join(current_paragraph)
-                if para_text.strip():
-                    story.append(Paragraph(para_text, normal_style))
+            flush()
             
             # Build PDF
             doc.build(story)
@@ -434,6 +562,12 @@ class CloudCompatibleFileConverter:
             logger.error(f"Enhanced ReportLab conversion failed: {e}")
             return None
     
+    @classmethod
+    @functools.lru_cache(maxsize=16)  # fixed notices repeat on every rerun; bytes are immutable
+    def render_notice_pdf(cls, text: str, title: str = "Document") -> bytes:
+        """Render a short fixed notice (unsupported format, missing library, no content) through FPDF, memoized"""
+        return cls.create_text_pdf_enhanced_fpdf(text, title)
+    
     @classmethod
     def create_text_pdf_enhanced_fpdf(cls, text: str, title: str = "Document") -> bytes:
         """Enhanced FPDF with better formatting and Unicode support"""
@@ -444,8 +578,7 @@ class CloudCompatibleFileConverter:
             
             # Title
             pdf.set_font('Arial', 'B', 16)
-            title_encoded = title.encode('latin-1', 'replace').decode('latin-1')
-            pdf.cell(0, 10, title_encoded, ln=True, align='C')
+            pdf.cell(0, 10, to_latin1(title), ln=True, align='C')
             pdf.ln(10)
             
             # Process content
@@ -460,16 +593,14 @@ class CloudCompatibleFileConverter:
                 if line.startswith('# '):
                     pdf.set_font('Arial', 'B', 14)
                     header = line[2:].strip()
-                    header_encoded = header.encode('utf-8', 'replace').decode('utf-8', 'replace')
-                    pdf.multi_cell(0, 7, header_encoded)
+                    pdf.multi_cell(0, 7, to_latin1(header))
                     pdf.ln(3)
                     pdf.set_font('Arial', size=10)
                 
                 elif line.startswith('## '):
                     pdf.set_font('Arial', 'B', 12)
                     header = line[3:].strip()
-                    header_encoded = header.encode('utf-8', 'replace').decode('utf-8', 'replace')
-                    pdf.multi_cell(0, 6, header_encoded)
+                    pdf.multi_cell(0, 6, to_latin1(header))
                     pdf.ln(2)
                     pdf.set_font('Arial', size=10)
                 
@@ -477,17 +608,15 @@ class CloudCompatibleFileConverter:
                 elif line.startswith(('• ', '- ', '* ')):
                     pdf.set_font('Arial', size=10)
                     list_text = "  • " + line[2:].strip()
-                    list_encoded = list_text.encode('utf-8', 'replace').decode('utf-8', 'replace')
-                    pdf.multi_cell(0, 5, list_encoded)
+                    pdf.multi_cell(0, 5, to_latin1(list_text))
                 
                 # Regular text
                 else:
                     pdf.set_font('Arial', size=10)
-                    text_encoded = line.encode('utf-8', 'replace').decode('utf-8', 'replace')
-                    pdf.multi_cell(0, 5, text_encoded)
+                    pdf.multi_cell(0, 5, to_latin1(line))
                     pdf.ln(2)
             
-            return pdf.output(dest='S').encode('latin-1', errors='replace')
+            return fpdf_output_bytes(pdf)
             
         except Exception as e:
             logger.error(f"Enhanced FPDF failed: {e}")
@@ -495,22 +624,29 @@ class CloudCompatibleFileConverter:
             pdf = FPDF()
             pdf.add_page()
             pdf.set_font("Arial", size=12)
-            pdf.multi_cell(0, 10, f"Error creating PDF: {str(e)}")
-            return pdf.output(dest='S').encode('latin-1', errors='replace')
+            pdf.multi_cell(0, 10, to_latin1(f"Error creating PDF: {str(e)}"))
+            return fpdf_output_bytes(pdf)
+
+    @staticmethod
+    def decode_text_bytes(file_content: bytes) -> str:
+        """Decode an uploaded text file: strict UTF-8 (BOM-aware) first, then byte-level charset detection"""
+        try:
+            return file_content.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            pass
+        
+        if CHARSET_NORMALIZER_AVAILABLE:
+            best = detect_charset(file_content).best()
+            if best is not None:
+                return str(best)
+        
+        return file_content.decode('utf-8', errors='ignore')
 
     @classmethod
     def convert_text_file(cls, file_content: bytes, filename: str) -> Optional[bytes]:
         """Enhanced text file conversion"""
         try:
-            # Decode with multiple encoding attempts
-            text = None
-            for encoding in ['utf-8', 'utf-8-sig', 'latin-1', 'cp1252', 'ascii']:
-                try:
-                    text = file_content.decode(encoding, errors='ignore')
-                    if text and text.strip():
-                        break
-                except:
-                    continue
+            text = cls.decode_text_bytes(file_content)
             
             if not text or not text.strip():
                 text = f"Empty or unreadable file: {filename}"
@@ -521,7 +657,7 @@ class CloudCompatibleFileConverter:
             if filename.lower().endswith('.md') and MARKDOWN_AVAILABLE:
                 try:
                     # Convert markdown to HTML then to text for better formatting
-                    html_content = markdown.markdown(text)
+                    html_content = lazy_import('markdown').markdown(text)
                     text = cls.html_to_text(html_content)
                 except Exception as e:
                     logger.warning(f"Markdown processing failed: {e}")
@@ -532,9 +668,10 @@ class CloudCompatibleFileConverter:
             elif filename.lower().endswith('.json'):
                 try:
                     # Pretty print JSON
-                    import json
-                    json_obj = json.loads(text)
-                    text = json.dumps(json_obj, indent=2, ensure_ascii=False)
+                    if ORJSON_AVAILABLE:
+                        text = orjson.dumps(orjson.loads(text), option=orjson.OPT_INDENT_2).decode('utf-8')
+                    else:
+                        text = json.dumps(json.loads(text), indent=2, ensure_ascii=False)
                 except:
                     pass  # Keep original text if JSON parsing fails
             
@@ -558,7 +695,7 @@ class CloudCompatibleFileConverter:
             
         except Exception as e:
             logger.error(f"Text file conversion failed for {filename}: {e}")
-            return cls.create_text_pdf_enhanced_fpdf(f"Error reading file {filename}: {str(e)}", filename)
+            raise
 
     @classmethod
     def convert_image_file_reportlab(cls, file_content: bytes, filename: str) -> Optional[bytes]:
@@ -568,14 +705,21 @@ class CloudCompatibleFileConverter:
                 return None
             
             with Image.open(io.BytesIO(file_content)) as img:
+                source_format = img.format
+                max_dimension = 5000  # Very high threshold
+                
+                # Decode huge JPEGs at reduced scale before anything touches the pixels
+                modified = draft_within(img, max_dimension)
+                
                 # Convert to RGB if necessary
                 if img.mode not in ('RGB', 'L'):
                     img = img.convert('RGB')
+                    modified = True
                 
                 # Only resize if image is extremely large
-                max_dimension = 5000  # Very high threshold
                 if img.width > max_dimension or img.height > max_dimension:
-                    img.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+                    img = fit_within(img, max_dimension)
+                    modified = True
                 
                 # Create PDF with ReportLab
                 buffer = io.BytesIO()
@@ -605,26 +749,25 @@ class CloudCompatibleFileConverter:
                     new_width = available_width
                     new_height = new_width / aspect_ratio
                 
-                # Save image to BytesIO with high quality
-                img_buffer = io.BytesIO()
-                img.save(img_buffer, format='PNG', optimize=False, quality=100)
-                img_buffer.seek(0)
+                if not modified and source_format in ('JPEG', 'PNG'):
+                    # ReportLab embeds JPEG/PNG as-is; no need to re-encode an untouched image
+                    img_buffer = io.BytesIO(file_content)
+                else:
+                    # Re-encode by content type: photos (JPEG sources) as JPEG, graphics as lossless PNG.
+                    # A PNG of a photo is typically ~10x the size of a high-quality JPEG.
+                    img_buffer = io.BytesIO()
+                    if source_format == 'JPEG':
+                        img.save(img_buffer, format='JPEG', quality=90, subsampling=0)
+                    else:
+                        img.save(img_buffer, format='PNG', optimize=False)
+                    img_buffer.seek(0)
                 
                 # Create ReportLab image
                 rl_img = RLImage(img_buffer, width=new_width, height=new_height)
                 
                 # Add title
-                styles = getSampleStyleSheet()
-                title_style = ParagraphStyle(
-                    'ImageTitle',
-                    parent=styles['Title'],
-                    fontSize=14,
-                    spaceAfter=20,
-                    alignment=TA_CENTER
-                )
-                
                 story = [
-                    Paragraph(os.path.splitext(filename)[0], title_style),
+                    Paragraph(os.path.splitext(filename)[0], image_title_style()),
                     rl_img
                 ]
                 
@@ -647,13 +790,15 @@ class CloudCompatibleFileConverter:
             
             # Fallback to PIL
             with Image.open(io.BytesIO(file_content)) as img:
+                max_dimension = 4000
+                draft_within(img, max_dimension)
+                
                 if img.mode not in ('RGB', 'L'):
                     img = img.convert('RGB')
                 
                 # Minimal resizing - only for extremely large images
-                max_dimension = 4000
                 if img.width > max_dimension or img.height > max_dimension:
-                    img.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+                    img = fit_within(img, max_dimension)
                 
                 # High-quality PDF conversion
                 pdf_buffer = io.BytesIO()
@@ -662,8 +807,7 @@ class CloudCompatibleFileConverter:
                 
         except Exception as e:
             logger.error(f"Image conversion failed for {filename}: {e}")
-            return cls.create_text_pdf_enhanced_fpdf(
-                f"Failed to convert image: {filename}\nError: {str(e)}", filename)
+            raise
 
     @classmethod
     def convert_docx_file_mammoth(cls, file_content: bytes) -> Optional[str]:
@@ -672,7 +816,7 @@ class CloudCompatibleFileConverter:
             if not MAMMOTH_AVAILABLE:
                 return None
             
-            result = mammoth.convert_to_html(io.BytesIO(file_content))
+            result = lazy_import('mammoth').convert_to_html(io.BytesIO(file_content))
             html_content = result.value
             
             if result.messages:
@@ -687,16 +831,27 @@ class CloudCompatibleFileConverter:
 
     @classmethod
     def extract_docx_text_advanced(cls, file_content: bytes) -> str:
-        """Advanced DOCX text extraction"""
-        try:
-            # Method 1: Try Mammoth
-            text = cls.convert_docx_file_mammoth(file_content)
-            if text and text.strip():
-                return text
-            
-            # Method 2: Try python-docx
-            if PYTHON_DOCX_AVAILABLE:
-                doc = python_docx.Document(io.BytesIO(file_content))
+        """Advanced DOCX text extraction; returns '' when no method finds any text and raises if the file can't be read"""
+        # Open the archive once: a non-DOCX/corrupt upload fails here instead of in every method,
+        # and the XML fallback reuses this handle
+        with zipfile.ZipFile(io.BytesIO(file_content), 'r') as docx_zip:
+            if 'word/document.xml' not in docx_zip.namelist():
+                raise ValueError("No document.xml found in DOCX file")
+            
+            # Method 1: Stream word/document.xml directly - the output is a text PDF,
+            # so there is no need to go DOCX -> HTML -> text through Mammoth
+            try:
+                xml_text = cls.extract_docx_text_xml(file_content, docx_zip)
+            except Exception as e:
+                logger.warning(f"DOCX XML extraction failed, trying python-docx: {e}")
+                xml_text = ""
+            if xml_text.strip():
+                return xml_text
+        
+        # Method 2: Try python-docx
+        if PYTHON_DOCX_AVAILABLE:
+            try:
+                doc = lazy_import('docx').Document(io.BytesIO(file_content))
                 paragraphs = []
                 
                 for paragraph in doc.paragraphs:
@@ -727,48 +882,89 @@ class CloudCompatibleFileConverter:
                 
                 if paragraphs:
                     return '\n\n'.join(paragraphs)
-            
-            # Method 3: XML parsing fallback
-            return cls.extract_docx_text_xml(file_content)
-            
-        except Exception as e:
-            logger.error(f"Advanced DOCX extraction failed: {e}")
-            return f"Error extracting DOCX content: {str(e)}"
+            except Exception as e:
+                logger.warning(f"python-docx extraction failed: {e}")
+        
+        # Method 3: Mammoth fallback
+        text = cls.convert_docx_file_mammoth(file_content)
+        return text if text and text.strip() else ""
 
     @classmethod
-    def extract_docx_text_xml(cls, file_content: bytes) -> str:
-        """Extract text from DOCX using XML parsing"""
-        try:
-            with zipfile.ZipFile(io.BytesIO(file_content), 'r') as docx_zip:
-                if 'word/document.xml' not in docx_zip.namelist():
-                    return "No document.xml found in DOCX file"
-                
-                xml_content = docx_zip.read('word/document.xml')
-                root = ET.fromstring(xml_content)
-                
-                paragraphs = []
-                current_paragraph = []
-                
-                for elem in root.iter():
-                    tag_name = elem.tag.split('}')[-1] if '}' in elem.tag else elem.tag
-                    
-                    if tag_name == 'p':  # New paragraph
-                        if current_paragraph:
-                            paragraphs.append(' '.join(current_paragraph))
-                            current_paragraph = []
-                    elif tag_name == 't' and elem.text:  # Text run
-                        current_paragraph.append(elem.text)
-                    elif tag_name == 'br':  # Line break
-                        current_paragraph.append('\n')
-                
-                if current_paragraph:
-                    paragraphs.append(' '.join(current_paragraph))
+    def extract_docx_text_xml(cls, file_content: bytes, docx_zip: Optional[zipfile.ZipFile] = None) -> str:
+        """Extract text from DOCX using XML parsing (reuses `docx_zip` when the caller already opened it).
+
+        Formatted like the python-docx path: runs are joined without separators (Word splits single
+        words across runs), Heading N paragraphs get N '#' marks and table rows become "A | B" lines,
+        kept in document order. Text boxes, which python-docx skips, are included once, as Mammoth
+        does: Word stores each one twice (mc:Choice and the VML mc:Fallback) and the Fallback copy
+        is ignored. Returns '' when the document has no text; parse errors propagate.
+        """
+        if docx_zip is None:
+            with zipfile.ZipFile(io.BytesIO(file_content), 'r') as own_zip:
+                return cls.extract_docx_text_xml(file_content, own_zip)
+        
+        if 'word/document.xml' not in docx_zip.namelist():
+            return ""
+        
+        blocks = []
+        sinks = [blocks]    # where finished paragraphs go: the body, or the innermost table cell
+        paragraphs = []     # open paragraphs (text boxes nest them): [pieces, heading level]
+        tables = []         # open tables, each a list of rows of cell strings
+        run_depth = 0       # w:tab also defines tab stops in paragraph properties; only runs emit text
+        fallback_depth = 0  # inside mc:Fallback, a second copy of content already read from mc:Choice
+        
+        # Stream the XML instead of building the whole tree; each paragraph is freed once consumed
+        with docx_zip.open('word/document.xml') as xml_stream:
+            for event, elem in xml_iterparse(xml_stream, events=('start', 'end')):
+                if elem.tag == cls.DOCX_MC_FALLBACK:
+                    fallback_depth += 1 if event == 'start' else -1
+                    continue
+                if fallback_depth:
+                    continue
                 
-                return '\n\n'.join(paragraphs) if paragraphs else "No text content found in DOCX"
+                tag_name = elem.tag.rsplit('}', 1)[-1]
                 
-        except Exception as e:
-            logger.error(f"DOCX XML extraction failed: {e}")
-            return f"Error extracting DOCX content: {str(e)}"
+                if event == 'start':
+                    if tag_name == 'p':
+                        paragraphs.append([[], 0])
+                    elif tag_name == 'r':
+                        run_depth += 1
+                    elif tag_name in ('br', 'cr') and run_depth and paragraphs:  # Line break
+                        paragraphs[-1][0].append('\n')
+                    elif tag_name == 'tab' and run_depth and paragraphs:
+                        paragraphs[-1][0].append('\t')
+                    elif tag_name == 'pStyle' and paragraphs:
+                        match = re.match(r'Heading\s*(\d)', elem.get(cls.DOCX_W_VAL, ''))
+                        if match:
+                            paragraphs[-1][1] = int(match.group(1))
+                    elif tag_name == 'tbl':
+                        tables.append([])
+                    elif tag_name == 'tr' and tables:
+                        tables[-1].append([])
+                    elif tag_name == 'tc':
+                        sinks.append([])
+                elif tag_name == 't':  # Text run (complete at its end event)
+                    if elem.text and paragraphs:
+                        paragraphs[-1][0].append(elem.text)
+                elif tag_name == 'r':
+                    run_depth -= 1
+                elif tag_name == 'p' and paragraphs:
+                    pieces, level = paragraphs.pop()
+                    text = ''.join(pieces)
+                    if text.strip():
+                        sinks[-1].append(f"{'#' * level} {text}" if level else text)
+                    elem.clear()
+                elif tag_name == 'tc' and len(sinks) > 1:
+                    cell_text = '\n'.join(sinks.pop()).strip()
+                    if cell_text and tables and tables[-1]:
+                        tables[-1][-1].append(cell_text)
+                elif tag_name == 'tbl' and tables:
+                    rows = [" | ".join(row) for row in tables.pop() if row]
+                    if rows:
+                        sinks[-1].append("\n".join(rows))
+                    elem.clear()
+        
+        return '\n\n'.join(blocks)
 
     @classmethod
     def convert_docx_file(cls, file_content: bytes, filename: str) -> Optional[bytes]:
@@ -776,11 +972,11 @@ class CloudCompatibleFileConverter:
         try:
             text = cls.extract_docx_text_advanced(file_content)
             
-            if text and text.strip() and "Error extracting" not in text:
+            if text.strip():
                 title = os.path.splitext(filename)[0]
                 return cls.convert_text_file(text.encode('utf-8'), f"{title}.txt")
             else:
-                return cls.create_text_pdf_enhanced_fpdf(
+                return cls.render_notice_pdf(
                     f"Unable to extract readable content from: {filename}\n\n"
                     "This DOCX file may contain complex formatting, images, or be corrupted.\n"
                     "Please try converting it to PDF manually or use a simpler format.",
@@ -789,50 +985,109 @@ class CloudCompatibleFileConverter:
             
         except Exception as e:
             logger.error(f"DOCX conversion failed for {filename}: {e}")
-            return cls.create_text_pdf_enhanced_fpdf(
-                f"Error processing DOCX file: {filename}\nError: {str(e)}", filename)
+            raise
+
+    @classmethod
+    def extract_pptx_slides_xml(cls, file_content: bytes) -> List[List[tuple]]:
+        """Read slide text straight from the PPTX XML: per slide, (is_title, text) for each top-level text shape"""
+        ns = cls.PPTX_NS
+        
+        def paragraph_text(para):
+            pieces = []
+            for child in para:
+                tag_name = child.tag.rsplit('}', 1)[-1]
+                if tag_name in ('r', 'fld'):  # Text run / field
+                    t = child.find('a:t', ns)
+                    if t is not None and t.text:
+                        pieces.append(t.text)
+                elif tag_name == 'br':  # Line break
+                    pieces.append('\n')
+            return ''.join(pieces)
+        
+        with zipfile.ZipFile(io.BytesIO(file_content), 'r') as pptx_zip:
+            # Slide order comes from presentation.xml's sldIdLst, not from the slideN.xml part names
+            rels = xml_fromstring(pptx_zip.read('ppt/_rels/presentation.xml.rels'))
+            targets = {rel.get('Id'): rel.get('Target') for rel in rels.iter(f'{cls.PACKAGE_RELS_NS}Relationship')}
+            presentation = xml_fromstring(pptx_zip.read('ppt/presentation.xml'))
+            
+            slides = []
+            for sld_id in presentation.iterfind('p:sldIdLst/p:sldId', ns):
+                target = targets[sld_id.get(f"{{{ns['r']}}}id")]
+                part = target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join('ppt', target))
+                sp_tree = xml_fromstring(pptx_zip.read(part)).find('p:cSld/p:spTree', ns)
+                
+                # Same shapes python-pptx would read: top-level p:sp with a text body (no groups, tables, pictures)
+                shapes = []
+                for sp in (sp_tree.iterfind('p:sp', ns) if sp_tree is not None else ()):
+                    tx_body = sp.find('p:txBody', ns)
+                    if tx_body is None:
+                        continue
+                    text = '\n'.join(paragraph_text(para) for para in tx_body.iterfind('a:p', ns))
+                    ph = sp.find('p:nvSpPr/p:nvPr/p:ph', ns)
+                    shapes.append((ph is not None and ph.get('type') == 'title', text))
+                slides.append(shapes)
+            return slides
+
+    @classmethod
+    def extract_pptx_slides_python_pptx(cls, file_content: bytes) -> List[List[tuple]]:
+        """Same shape as extract_pptx_slides_xml, read through python-pptx's object model"""
+        prs = lazy_import('pptx').Presentation(io.BytesIO(file_content))
+        slides = []
+        for slide in prs.slides:
+            shapes = []
+            for shape in slide.shapes:
+                # Pictures, tables and groups have no text frame; skip them before touching any XML
+                if not shape.has_text_frame:
+                    continue
+                is_title = shape.is_placeholder and shape.placeholder_format.type == cls.PPTX_TITLE_PLACEHOLDER
+                shapes.append((is_title, shape.text))
+            slides.append(shapes)
+        return slides
 
     @classmethod
     def convert_pptx_file(cls, file_content: bytes, filename: str) -> Optional[bytes]:
         """Enhanced PPTX conversion"""
         try:
-            if not PYTHON_PPTX_AVAILABLE:
-                return cls.create_text_pdf_enhanced_fpdf(
-                    f"PPTX conversion not available for: {filename}\n\n"
-                    "The python-pptx library is not installed.\n"
-                    "Text content cannot be extracted from PowerPoint files.",
-                    filename
-                )
-            
-            prs = PptxPresentation(io.BytesIO(file_content))
-            slides_content = []
-            
-            for i, slide in enumerate(prs.slides, 1):
-                slide_content = [f"# Slide {i}"]
-                
-                for shape in slide.shapes:
-                    if hasattr(shape, "text") and shape.text.strip():
-                        # Detect slide structure
-                        if hasattr(shape, 'placeholder_format') and shape.placeholder_format:
-                            if shape.placeholder_format.type == 1:  # Title
-                                slide_content.append(f"## {shape.text}")
-                            elif shape.placeholder_format.type == 2:  # Content
-                                slide_content.append(shape.text)
-                            else:
-                                slide_content.append(shape.text)
-                        else:
-                            slide_content.append(shape.text)
+            # Read the slide XML directly; python-pptx's object model is only the fallback
+            try:
+                slides = cls.extract_pptx_slides_xml(file_content)
+            except Exception as e:
+                logger.warning(f"PPTX XML extraction failed for {filename}, trying python-pptx: {e}")
+                if not PYTHON_PPTX_AVAILABLE:
+                    return cls.render_notice_pdf(
+                        f"PPTX conversion not available for: {filename}\n\n"
+                        "The python-pptx library is not installed.\n"
+                        "Text content cannot be extracted from PowerPoint files.",
+                        filename
+                    )
+                slides = cls.extract_pptx_slides_python_pptx(file_content)
+            
+            # One flat list of pieces joined once at the end (no per-slide join + outer join)
+            parts = []
+            
+            for i, shapes in enumerate(slides, 1):
+                if parts:
+                    parts.append("\n\n---\n\n")
+                parts.append(f"# Slide {i}")
+                had_text = False
                 
-                if len(slide_content) == 1:
-                    slide_content.append("(No text content on this slide)")
+                for is_title, text in shapes:
+                    if not text.strip():
+                        continue
+                    
+                    # Detect slide structure: only title placeholders become headings
+                    parts.append("\n\n## " if is_title else "\n\n")
+                    parts.append(text)
+                    had_text = True
                 
-                slides_content.append('\n\n'.join(slide_content))
+                if not had_text:
+                    parts.append(cls.NO_SLIDE_TEXT)
             
-            if slides_content:
-                full_text = '\n\n---\n\n'.join(slides_content)
+            if parts:
+                full_text = ''.join(parts)
                 return cls.convert_text_file(full_text.encode('utf-8'), f"{filename}.txt")
             else:
-                return cls.create_text_pdf_enhanced_fpdf(
+                return cls.render_notice_pdf(
                     f"No content found in presentation: {filename}", filename)
             
         except Exception as e:
@@ -840,6 +1095,38 @@ class CloudCompatibleFileConverter:
             return cls.create_text_pdf_enhanced_fpdf(
                 f"Error processing PPTX file: {filename}\nError: {str(e)}", filename)
 
+    @classmethod
+    def convert_many(cls, uploaded_files, max_workers: Optional[int] = None, on_progress=None) -> List[tuple]:
+        """Convert several uploads concurrently; returns (ConvertedFile or None, exception or None) per upload, in input order.
+
+        on_progress(done, total) is called from the calling thread as each upload finishes.
+        """
+        def _convert(uploaded_file):
+            try:
+                return cls.convert_uploaded_file_to_pdf(uploaded_file), None
+            except Exception as e:
+                return None, e
+        
+        if max_workers is None:
+            # Pillow image decode/resize and zip/zlib inflate release the GIL, so those overlap across threads;
+            # ReportLab layout is pure Python and holds it, so text-heavy batches gain less
+            max_workers = min(8, (os.cpu_count() or 1) * 2)
+        results = [None] * len(uploaded_files)
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {pool.submit(_convert, uploaded_file): i for i, uploaded_file in enumerate(uploaded_files)}
+            for done, future in enumerate(as_completed(futures), 1):
+                results[futures[future]] = future.result()
+                if on_progress:
+                    on_progress(done, len(uploaded_files))
+        return results
+    
+    @classmethod
+    @cached_conversion
+    def convert_supported_file(cls, file_content: bytes, filename: str) -> Optional[bytes]:
+        """Run the CONVERTERS entry for the file's suffix; the one cached conversion step"""
+        method_name = cls.CONVERTERS[os.path.splitext(filename)[1].lower()][0]
+        return getattr(cls, method_name)(file_content, filename)
+    
     @classmethod
     def convert_uploaded_file_to_pdf(cls, uploaded_file) -> Optional[ConvertedFile]:
         """Main conversion method with enhanced quality"""
@@ -853,7 +1140,7 @@ class CloudCompatibleFileConverter:
         try:
             # Handle PDF files (pass through)
             if suffix == ".pdf":
-                pages = count_pdf_pages(file_content)
+                digest = hashlib.sha256(file_content).hexdigest()
                 return ConvertedFile(
                     orig_name=filename,
                     pdf_name=filename,
@@ -861,35 +1148,19 @@ class CloudCompatibleFileConverter:
                     settings=PrintSettings(),
                     original_bytes=file_content,
                     conversion_method="passthrough",
-                    pages=pages
+                    pages=page_count_cached(digest, file_content),
+                    sha256=digest
                 )
             
-            pdf_bytes = None
-            conversion_method = "unknown"
-            
-            # Handle text files
-            if suffix in cls.SUPPORTED_TEXT_EXTENSIONS:
-                pdf_bytes = cls.convert_text_file(file_content, filename)
-                conversion_method = "enhanced_text"
-            
-            # Handle image files
-            elif suffix in cls.SUPPORTED_IMAGE_EXTENSIONS:
-                pdf_bytes = cls.convert_image_file(file_content, filename)
-                conversion_method = "enhanced_image"
-            
-            # Handle DOCX files
-            elif suffix == ".docx":
-                pdf_bytes = cls.convert_docx_file(file_content, filename)
-                conversion_method = "enhanced_docx"
-            
-            # Handle PPTX files
-            elif suffix == ".pptx":
-                pdf_bytes = cls.convert_pptx_file(file_content, filename)
-                conversion_method = "enhanced_pptx"
+            # Text, image, DOCX and PPTX files
+            converter = cls.CONVERTERS.get(suffix)
+            if converter:
+                conversion_method = converter[1]
+                pdf_bytes = cls.convert_supported_file(file_content, filename)
             
             # Unsupported format
             else:
-                pdf_bytes = cls.create_text_pdf_enhanced_fpdf(
+                pdf_bytes = cls.render_notice_pdf(
                     f"Unsupported file format: {suffix}\n\n"
                     f"File: {filename}\n"
                     f"Size: {len(file_content)} bytes\n\n"
@@ -904,7 +1175,8 @@ class CloudCompatibleFileConverter:
                 conversion_method = "unsupported"
             
             if pdf_bytes:
-                pages = count_pdf_pages(pdf_bytes)
+                digest = hashlib.sha256(pdf_bytes).hexdigest()
+                pages = page_count_cached(digest, pdf_bytes)
                 pdf_name = os.path.splitext(filename)[0] + ".pdf"
                 
                 return ConvertedFile(
@@ -912,9 +1184,9 @@ class CloudCompatibleFileConverter:
                     pdf_name=pdf_name,
                     pdf_bytes=pdf_bytes,
                     settings=PrintSettings(),
-                    original_bytes=file_content,
                     conversion_method=conversion_method,
-                    pages=pages
+                    pages=pages,
+                    sha256=digest
                 )
             
             return None
@@ -934,7 +1206,6 @@ class CloudCompatibleFileConverter:
                     pdf_name=f"ERROR_{filename}.pdf",
                     pdf_bytes=error_pdf,
                     settings=PrintSettings(),
-                    original_bytes=file_content,
                     conversion_method="error",
                     pages=1
                 )
@@ -942,17 +1213,63 @@ class CloudCompatibleFileConverter:
                 return None
 
 # --------- PDF Page Counting ----------
-def count_pdf_pages(pdf_bytes: Optional[bytes]) -> int:
-    """Count pages in PDF with better error handling"""
+_RE_PDF_PAGE_OBJ = re.compile(rb'/Type\s*/Page(?![A-Za-z])')
+_RE_PDF_ROOT_REF = re.compile(rb'/Root\s+(\d+)\s+(\d+)\s+R')
+_RE_PDF_PAGES_REF = re.compile(rb'/Pages\s+(\d+)\s+(\d+)\s+R')
+_RE_PDF_COUNT = re.compile(rb'/Count\s+(\d+)')
+
+def pdf_object_body(pdf_bytes: bytes, num: int, gen: int) -> Optional[bytes]:
+    """Bytes between `num gen obj` and its `endobj`, or None if the object isn't stored plainly"""
+    match = re.search(rb'(?<!\d)%d\s+%d\s+obj\b' % (num, gen), pdf_bytes)
+    if not match:
+        return None
+    end = pdf_bytes.find(b'endobj', match.end())
+    return pdf_bytes[match.end():end] if end != -1 else None
+
+def pdf_root_page_count(pdf_bytes: bytes) -> Optional[int]:
+    """/Count of the page tree root, reached through the trailer's /Root catalog"""
+    roots = _RE_PDF_ROOT_REF.findall(pdf_bytes)
+    if not roots:
+        return None
+    catalog = pdf_object_body(pdf_bytes, *map(int, roots[-1]))  # the document trailer comes last
+    pages_ref = _RE_PDF_PAGES_REF.search(catalog) if catalog else None
+    if not pages_ref:
+        return None
+    pages = pdf_object_body(pdf_bytes, *map(int, pages_ref.groups()))
+    count = _RE_PDF_COUNT.search(pages) if pages else None
+    return int(count.group(1)) if count else None
+
+def scan_pdf_page_count(pdf_bytes: bytes) -> Optional[int]:
+    """Count /Type /Page objects straight from the bytes; None when the layout makes that unreliable.
+
+    Object streams (/ObjStm) hide page dicts inside compressed data and incremental updates
+    (more than one %%EOF) can leave superseded page objects behind, so those go to PdfReader.
+    The count prices the job, so it is only trusted when it agrees with the page tree's /Count:
+    orphaned page objects or an uncompressed embedded PDF would otherwise overcharge.
+    """
+    if b'/ObjStm' in pdf_bytes or pdf_bytes.count(b'%%EOF') != 1:
+        return None
+    count = len(_RE_PDF_PAGE_OBJ.findall(pdf_bytes))
+    if not count or count != pdf_root_page_count(pdf_bytes):
+        return None
+    return count
+
+def count_pdf_pages(pdf_bytes: Optional[bytes], strict: bool = False) -> int:
+    """Count pages in PDF with better error handling (strict=True always parses with PdfReader)"""
     if not pdf_bytes:
         return 1
     
+    if not strict:
+        scanned = scan_pdf_page_count(pdf_bytes)
+        if scanned:
+            return scanned
+    
     if not PDF_READER_AVAILABLE:
         logger.warning("PDF reader not available, defaulting to 1 page")
         return 1
     
     try:
-        reader = PdfReader(io.BytesIO(pdf_bytes))
+        reader = lazy_import(PDF_READER_MODULE).PdfReader(io.BytesIO(pdf_bytes))
         return len(reader.pages)
     except Exception as e:
         logger.warning(f"Failed to count PDF pages: {e}")
@@ -965,6 +1282,25 @@ def count_pdf_pages(pdf_bytes: Optional[bytes]) -> int:
         else:
             return max(1, int(size_kb / 100))
 
+PAGE_COUNT_CACHE_SIZE = 256
+_page_count_cache: "OrderedDict[str, int]" = OrderedDict()
+_page_count_cache_lock = threading.Lock()
+
+def page_count_cached(sha256: str, pdf_bytes: bytes) -> int:
+    """count_pdf_pages memoized by the PDF's sha256, so reruns and repeat uploads skip the parse"""
+    with _page_count_cache_lock:
+        pages = _page_count_cache.get(sha256)
+        if pages is not None:
+            _page_count_cache.move_to_end(sha256)
+            return pages
+    
+    pages = count_pdf_pages(pdf_bytes)
+    with _page_count_cache_lock:
+        _page_count_cache[sha256] = pages
+        while len(_page_count_cache) > PAGE_COUNT_CACHE_SIZE:
+            _page_count_cache.popitem(last=False)
+    return pages
+
 # --------- Streamlit Configuration ----------
 st.set_page_config(
     page_title="Autoprint (Cloud-Compatible)", 
@@ -1028,11 +1364,13 @@ st.markdown("<h1 style='text-align:center; margin-bottom:2rem;'>🖨️ Autoprin
 def init_session_state():
     defaults = {
         'converted_files': [],
+        'conversion_key': None,
+        'conversion_summary': ([], 0, 0),
         'payinfo': None,
         'status': "",
         'process_complete': False,
         'user_name': "",
-        'user_id': str(uuid.uuid4())[:8],
+        'user_id': secrets.token_hex(4),
         'pricing': {
             "price_bw_per_page": 2.00,
             "price_color_per_page": 5.00,
@@ -1044,8 +1382,7 @@ def init_session_state():
     }
     
     for key, value in defaults.items():
-        if key not in st.session_state:
-            st.session_state[key] = value
+        st.session_state.setdefault(key, value)
 
 init_session_state()
 
@@ -1056,12 +1393,37 @@ def set_status(message: str):
 
 # --------- Firestore Initialization ----------
 COLLECTION = "files"
-CHUNK_SIZE = 200_000
+CHUNK_SIZE = 900_000  # base64 chars per chunk doc (multiple of 4); Firestore caps a doc at 1 MiB
+BATCH_MAX_WRITES = 500  # Firestore limit per batch commit
+BATCH_MAX_BYTES = 9 * 1024 * 1024  # commit requests are capped at 10 MiB; leave headroom for field names
+UPLOAD_MAX_WORKERS = 4
 
 db = None
 FIRESTORE_OK = False
 FIRESTORE_ERR = None
 
+@st.cache_resource(show_spinner=False)
+def get_firestore_client():
+    """Firestore client built once per process and shared across reruns/sessions (one app init, one gRPC channel)"""
+    if not hasattr(st, "secrets") or "firebase_service_account" not in st.secrets:
+        raise RuntimeError("Add 'firebase_service_account' to Streamlit Secrets")
+    
+    service_account_info = st.secrets["firebase_service_account"]
+    
+    if isinstance(service_account_info, str):
+        service_account_info = orjson.loads(service_account_info) if ORJSON_AVAILABLE else json.loads(service_account_info)
+    
+    if "private_key" in service_account_info:
+        service_account_info["private_key"] = service_account_info["private_key"].replace("\\n", "\n")
+    
+    try:
+        app = firebase_admin.get_app()
+    except ValueError:
+        cred = credentials.Certificate(service_account_info)
+        app = firebase_admin.initialize_app(cred)
+    
+    return firestore.client()
+
 def init_firestore():
     global db, FIRESTORE_OK, FIRESTORE_ERR
     
@@ -1070,24 +1432,7 @@ def init_firestore():
         return
     
     try:
-        if not hasattr(st, "secrets") or "firebase_service_account" not in st.secrets:
-            raise RuntimeError("Add 'firebase_service_account' to Streamlit Secrets")
-        
-        service_account_info = st.secrets["firebase_service_account"]
-        
-        if isinstance(service_account_info, str):
-            service_account_info = json.loads(service_account_info)
-        
-        if "private_key" in service_account_info:
-            service_account_info["private_key"] = service_account_info["private_key"].replace("\\n", "\n")
-        
-        try:
-            app = firebase_admin.get_app()
-        except ValueError:
-            cred = credentials.Certificate(service_account_info)
-            app = firebase_admin.initialize_app(cred)
-        
-        db = firestore.client()
+        db = get_firestore_client()
         FIRESTORE_OK = True
         set_status("Firestore initialized successfully")
         
@@ -1100,9 +1445,6 @@ def init_firestore():
 init_firestore()
 
 # --------- Utility Functions ----------
-def sha256_bytes(data: bytes) -> str:
-    return hashlib.sha256(data).hexdigest()
-
 def meta_doc_id(file_id: str) -> str:
     return f"{file_id}_meta"
 
@@ -1131,6 +1473,88 @@ def generate_upi_uri(upi_id: str, amount: float, note: str = None) -> str:
     return "upi://pay?" + "&".join(params)
 
 # --------- File Upload and Processing ----------
+def iter_base64_chunks(data: bytes, chunk_chars: int = CHUNK_SIZE):
+    """Yield the base64 text of `data` in chunk_chars pieces, encoding one slice at a time.
+
+    Slices are a multiple of 3 bytes, so the pieces concatenate to exactly b64encode(data).
+    """
+    raw_step = chunk_chars // 4 * 3
+    view = memoryview(data)
+    for start in range(0, len(data), raw_step):
+        yield base64.b64encode(view[start:start + raw_step]).decode('ascii')
+
+def base64_chunk_count(size: int, chunk_chars: int = CHUNK_SIZE) -> int:
+    """Number of pieces iter_base64_chunks yields for `size` raw bytes"""
+    raw_step = chunk_chars // 4 * 3
+    return -(-size // raw_step)
+
+def group_chunk_batches(chunks):
+    """Group (chunk_index, chunk_data) pairs into lists that fit one Firestore batch commit"""
+    batch, batch_bytes = [], 0
+    for chunk_index, chunk_data in enumerate(chunks):
+        if batch and (len(batch) >= BATCH_MAX_WRITES or batch_bytes + len(chunk_data) > BATCH_MAX_BYTES):
+            yield batch
+            batch, batch_bytes = [], 0
+        batch.append((chunk_index, chunk_data))
+        batch_bytes += len(chunk_data)
+    if batch:
+        yield batch
+
+def upload_chunk_batches(file_chunks, on_progress=None, on_file_done=None, max_workers: int = UPLOAD_MAX_WORKERS):
+    """Write chunk docs for several files through one pool of batched commits.
+
+    file_chunks yields (file_id, chunks); on_progress(n) and on_file_done(file_id) run on the caller's
+    thread (safe for Streamlit widgets), the latter once every chunk of that file is committed.
+    """
+    coll_ref = db.collection(COLLECTION)
+    timestamp = datetime.datetime.now()
+    
+    def commit_batch(file_id, pairs):
+        def upload_batch():
+            batch = db.batch()
+            for chunk_index, chunk_data in pairs:
+                batch.set(coll_ref.document(chunk_doc_id(file_id, chunk_index)), {
+                    "data": chunk_data,
+                    "chunk_index": chunk_index,
+                    "file_id": file_id,
+                    "timestamp": timestamp
+                })
+            batch.commit()
+        
+        retry_with_backoff(upload_batch, attempts=3)
+        return file_id, len(pairs)
+    
+    pending = {}  # file_id -> batches submitted but not yet committed
+    queued = set()  # files whose batches have all been submitted
+    
+    def finish_if_done(file_id):
+        if file_id in queued and pending[file_id] == 0 and on_file_done:
+            on_file_done(file_id)
+    
+    def report(futures):
+        for future in futures:
+            file_id, written = future.result()
+            pending[file_id] -= 1
+            if on_progress:
+                on_progress(written)
+            finish_if_done(file_id)
+    
+    # Bounded window: chunks may be generators, so only a few batches are ever materialized at once.
+    # Files share the window, so small files no longer wait for each other one round trip at a time.
+    in_flight = set()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for file_id, chunks in file_chunks:
+            pending[file_id] = 0
+            for pairs in group_chunk_batches(chunks):
+                if len(in_flight) >= max_workers * 2:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    report(done)
+                pending[file_id] += 1
+                in_flight.add(pool.submit(commit_batch, file_id, pairs))
+            queued.add(file_id)
+            finish_if_done(file_id)
+        report(as_completed(in_flight))
+
 def upload_files_to_firestore(converted_files: List[ConvertedFile], job_settings: dict):
     """Upload files to Firestore with progress tracking"""
     
@@ -1143,22 +1567,22 @@ def upload_files_to_firestore(converted_files: List[ConvertedFile], job_settings
         return False
     
     try:
-        job_id = str(uuid.uuid4())[:12]
+        job_id = secrets.token_hex(6)
         set_status(f"Starting upload for job {job_id}")
         
         files_metadata = []
         total_chunks = 0
         
         for cf in converted_files:
-            file_id = str(uuid.uuid4())[:8]
+            file_id = secrets.token_hex(4)
             pdf_data = cf.pdf_bytes
             
             if not pdf_data:
                 st.warning(f"⚠️ No PDF data for {cf.orig_name}, skipping")
                 continue
             
-            b64_data = base64.b64encode(pdf_data).decode('utf-8')
-            chunks = [b64_data[i:i+CHUNK_SIZE] for i in range(0, len(b64_data), CHUNK_SIZE)]
+            # Chunks are encoded lazily at upload time; only the count is needed up front
+            chunk_count = base64_chunk_count(len(pdf_data))
             
             file_meta = {
                 "file_id": file_id,
@@ -1175,14 +1599,14 @@ def upload_files_to_firestore(converted_files: List[ConvertedFile], job_settings
                     "orientation": cf.settings.orientation,
                     "collate": cf.settings.collate
                 },
-                "chunks": chunks,
-                "total_chunks": len(chunks),
-                "sha256": sha256_bytes(pdf_data),
+                "pdf_bytes": pdf_data,
+                "total_chunks": chunk_count,
+                "sha256": cf.sha256 or hashlib.sha256(pdf_data).hexdigest(),
                 "job_id": job_id
             }
             
             files_metadata.append(file_meta)
-            total_chunks += len(chunks)
+            total_chunks += chunk_count
         
         if not files_metadata:
             st.error("❌ No valid files to upload after processing.")
@@ -1192,30 +1616,16 @@ def upload_files_to_firestore(converted_files: List[ConvertedFile], job_settings
         status_text = st.empty()
         uploaded_chunks = 0
         
-        for file_meta in files_metadata:
-            file_id = file_meta["file_id"]
-            filename = file_meta["filename"]
-            
-            status_text.text(f"Uploading {filename}...")
-            
-            for chunk_index, chunk_data in enumerate(file_meta["chunks"]):
-                chunk_doc_id_str = chunk_doc_id(file_id, chunk_index)
-                
-                def upload_chunk():
-                    doc_ref = db.collection(COLLECTION).document(chunk_doc_id_str)
-                    doc_ref.set({
-                        "data": chunk_data,
-                        "chunk_index": chunk_index,
-                        "file_id": file_id,
-                        "timestamp": datetime.datetime.now()
-                    })
-                
-                retry_with_backoff(upload_chunk, attempts=3)
-                uploaded_chunks += 1
-                
-                progress = uploaded_chunks / total_chunks
-                progress_bar.progress(progress)
-            
+        metas_by_id = {file_meta["file_id"]: file_meta for file_meta in files_metadata}
+        
+        def advance(written):
+            nonlocal uploaded_chunks
+            uploaded_chunks += written
+            progress_bar.progress(uploaded_chunks / total_chunks)
+        
+        def write_metadata(file_id):
+            # Only called once all of this file's chunks are committed, so the receiver never sees a partial file
+            file_meta = metas_by_id[file_id]
             meta_doc = {
                 "total_chunks": file_meta["total_chunks"],
                 "file_name": file_meta["filename"],
@@ -1238,7 +1648,14 @@ def upload_files_to_firestore(converted_files: List[ConvertedFile], job_settings
             
             retry_with_backoff(upload_metadata, attempts=3)
             
-            set_status(f"Uploaded {filename} ({file_meta['total_chunks']} chunks)")
+            set_status(f"Uploaded {file_meta['filename']} ({file_meta['total_chunks']} chunks)")
+        
+        status_text.text(f"Uploading {len(files_metadata)} file(s)...")
+        upload_chunk_batches(
+            ((file_meta["file_id"], iter_base64_chunks(file_meta["pdf_bytes"])) for file_meta in files_metadata),
+            on_progress=advance,
+            on_file_done=write_metadata
+        )
         
         progress_bar.progress(1.0)
         status_text.text("✅ Upload completed!")
@@ -1253,7 +1670,7 @@ def upload_files_to_firestore(converted_files: List[ConvertedFile], job_settings
         return False
 
 def poll_for_payment_info(files_metadata: List[dict], job_settings: dict):
-    """Poll Firestore for payment information from receiver"""
+    """Wait for payment information from receiver via Firestore snapshot listeners"""
     
     set_status("Waiting for payment information from receiver...")
     show_local_estimate(files_metadata, job_settings)
@@ -1263,33 +1680,48 @@ def poll_for_payment_info(files_metadata: List[dict], job_settings: dict):
     
     progress_container = st.container()
     
-    while time.time() - poll_start < max_poll_time:
-        try:
-            for file_meta in files_metadata:
-                file_id = file_meta["file_id"]
-                
-                doc_ref = db.collection(COLLECTION).document(meta_doc_id(file_id))
-                doc_snapshot = doc_ref.get()
-                
-                if doc_snapshot.exists:
-                    doc_data = doc_snapshot.to_dict()
-                    
-                    if doc_data.get("payinfo"):
-                        st.session_state.payinfo = doc_data["payinfo"]
-                        set_status("✅ Received official payment information!")
-                        return
-            
-            elapsed = int(time.time() - poll_start)
-            remaining = max_poll_time - elapsed
+    # Firestore pushes meta doc changes instead of us re-reading every doc every 2s
+    received = threading.Event()
+    payinfo_holder = {}
+    
+    def on_snapshot(doc_snapshots, changes, read_time):
+        # Runs on the listener thread: only record the result, Streamlit is updated below
+        for doc_snapshot in doc_snapshots:
+            if doc_snapshot.exists:
+                payinfo = (doc_snapshot.to_dict() or {}).get("payinfo")
+                if payinfo:
+                    payinfo_holder.setdefault("payinfo", payinfo)
+                    received.set()
+    
+    watches = []
+    try:
+        for file_meta in files_metadata:
+            doc_ref = db.collection(COLLECTION).document(meta_doc_id(file_meta["file_id"]))
+            watches.append(doc_ref.on_snapshot(on_snapshot))
+        
+        while not received.is_set():
+            remaining = int(max_poll_time - (time.time() - poll_start))
+            if remaining <= 0:
+                break
             
             with progress_container:
-                st.info(f"⏳ Polling for payment info... ({remaining}s remaining)")
+                st.info(f"⏳ Waiting for payment info... ({remaining}s remaining)")
             
-            time.sleep(2)
+            received.wait(timeout=min(2, remaining))
             
-        except Exception as e:
-            logger.error(f"Polling error: {e}")
-            break
+    except Exception as e:
+        logger.error(f"Payment listener error: {e}")
+    finally:
+        for watch in watches:
+            try:
+                watch.unsubscribe()
+            except Exception as e:
+                logger.warning(f"Failed to stop payment listener: {e}")
+    
+    if received.is_set():
+        st.session_state.payinfo = payinfo_holder["payinfo"]
+        set_status("✅ Received official payment information!")
+        return
     
     set_status("⚠️ Timeout waiting for official payment info. Using local estimate.")
 
@@ -1301,15 +1733,15 @@ def show_local_estimate(files_metadata: List[dict], job_settings: dict):
         total_amount = 0.0
         total_pages = 0
         
+        # Job-wide settings don't change per file
+        copies = job_settings.get("copies", 1)
+        is_color = "color" in job_settings.get("color_mode", "Color").lower()
+        
         for file_meta in files_metadata:
             pages = file_meta["pages"]
-            copies = job_settings.get("copies", 1)
-            
-            color_mode = job_settings.get("color_mode", "Color")
-            is_color = "color" in color_mode.lower()
             
-            duplex_setting = file_meta["settings"].get("duplex", "Single-sided")
-            is_duplex = "duplex" in duplex_setting.lower() or "two" in duplex_setting.lower()
+            duplex_setting = file_meta["settings"].get("duplex", "Single-sided").lower()
+            is_duplex = "duplex" in duplex_setting or "two" in duplex_setting
             
             file_amount = calculate_amount(pricing, pages, copies, is_color, is_duplex)
             total_amount += file_amount
@@ -1360,7 +1792,7 @@ def handle_online_payment():
     
     if QR_AVAILABLE:
         try:
-            qr = qrcode.QRCode(version=1, box_size=8, border=2)
+            qr = lazy_import('qrcode').QRCode(version=1, box_size=8, border=2)
             qr.add_data(upi_uri)
             qr.make(fit=True)
             
@@ -1410,6 +1842,83 @@ def cancel_payment():
     st.session_state.payinfo = None
     set_status("❌ Payment cancelled by user")
 
+def start_new_print_job():
+    """Reset session state for a new job (button callback, runs before the rerun)"""
+    st.session_state.update({
+        'converted_files': [],
+        'conversion_key': None,
+        'conversion_summary': ([], 0, 0),
+        'payinfo': None,
+        'process_complete': False,
+        'status': "",
+        'user_id': secrets.token_hex(4),
+    })
+
+# --------- Preview Helpers ----------
+PREVIEW_MAX_BYTES = 2 * 1024 * 1024  # Chrome refuses data: URI PDFs much past ~2 MB
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def pdf_data_uri(sha256: str, _pdf_bytes: bytes) -> str:
+    """Base64 data URI for the inline preview, cached by digest so reruns don't re-encode"""
+    return "data:application/pdf;base64," + base64.b64encode(_pdf_bytes).decode('ascii')
+
+# --------- Job Settings Fragment ----------
+@st.fragment
+def render_job_settings(converted_files: List[ConvertedFile], pages_per_copy: int, enhanced_files: int):
+    """Copies/colour/paper widgets, cost estimate and send button; widget changes rerun only this fragment"""
+    st.markdown("#### ⚙️ Print Job Settings")
+    
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        copies = st.number_input(
+            "Copies", 
+            min_value=1, 
+            max_value=20, 
+            value=1,
+            help="Number of copies for each file"
+        )
+    
+    with col2:
+        color_mode = st.selectbox(
+            "Color Mode",
+            options=["Auto", "Color", "Monochrome"],
+            help="Color printing mode"
+        )
+    
+    with col3:
+        paper_size = st.selectbox(
+            "Paper Size",
+            options=["A4", "A3", "Letter"],
+            help="Paper size for printing"
+        )
+    
+    # Calculate total pages and estimated cost
+    total_pages = pages_per_copy * copies
+    pricing = st.session_state.pricing
+    
+    is_color = "color" in color_mode.lower()
+    estimated_cost = calculate_amount(pricing, total_pages, 1, is_color, False)
+    
+    st.info(f"📊 **Total Pages:** {total_pages} | **Estimated Cost:** ₹{estimated_cost:.2f}")
+    
+    # Quality Summary
+    if enhanced_files > 0:
+        st.success(f"🌟 {enhanced_files} out of {len(converted_files)} files converted with enhanced quality!")
+    
+    # Upload Button
+    job_settings = {
+        "copies": copies,
+        "color_mode": color_mode,
+        "paper_size": paper_size
+    }
+    
+    if st.button("🚀 Send Files for Printing", type="primary", use_container_width=True):
+        success = upload_files_to_firestore(converted_files, job_settings)
+        if success:
+            # Full-app rerun: the status and payment sections live outside this fragment
+            st.rerun()
+
 # --------- Main UI ----------
 
 # Sidebar for system information
@@ -1503,17 +2012,38 @@ else:
     )
     
     if uploaded_files:
-        with st.spinner("🔄 Converting files with cloud-optimized quality..."):
-            converted_files = []
-            conversion_results = []
-            
-            for uploaded_file in uploaded_files:
-                try:
-                    converted_file = CloudCompatibleFileConverter.convert_uploaded_file_to_pdf(uploaded_file)
-                    if converted_file:
+        # Streamlit reruns this script on every widget change; only convert when the upload set changes
+        upload_key = tuple((f.name, f.size, getattr(f, "file_id", None)) for f in uploaded_files)
+        if st.session_state.get("conversion_key") != upload_key:
+            with st.spinner("🔄 Converting files with cloud-optimized quality..."):
+                converted_files = []
+                conversion_results = []
+                pages_per_copy = 0  # summary for the job settings section, gathered while we're here
+                enhanced_files = 0
+                
+                conversion_progress = st.progress(0.0)
+                results = CloudCompatibleFileConverter.convert_many(
+                    uploaded_files,
+                    on_progress=lambda done, total: conversion_progress.progress(done / total, text=f"Converted {done}/{total}")
+                )
+                conversion_progress.empty()
+                for uploaded_file, (converted_file, error) in zip(uploaded_files, results):
+                    if error is not None:
+                        logger.error(f"Conversion error for {uploaded_file.name}: {error}")
+                        conversion_results.append({
+                            "filename": uploaded_file.name,
+                            "status": f"❌ Error: {str(error)[:50]}",
+                            "method": "error",
+                            "pages": 0,
+                            "quality": "❌ Error"
+                        })
+                    elif converted_file:
                         converted_files.append(converted_file)
                         
-                        quality_indicator = "🌟 Enhanced" if "enhanced" in converted_file.conversion_method else "📄 Standard"
+                        is_enhanced = "enhanced" in converted_file.conversion_method
+                        pages_per_copy += converted_file.pages
+                        enhanced_files += is_enhanced
+                        quality_indicator = "🌟 Enhanced" if is_enhanced else "📄 Standard"
                         
                         conversion_results.append({
                             "filename": uploaded_file.name,
@@ -1530,132 +2060,94 @@ else:
                             "pages": 0,
                             "quality": "❌ Failed"
                         })
-                except Exception as e:
-                    logger.error(f"Conversion error for {uploaded_file.name}: {e}")
-                    conversion_results.append({
-                        "filename": uploaded_file.name,
-                        "status": f"❌ Error: {str(e)[:50]}",
-                        "method": "error",
-                        "pages": 0,
-                        "quality": "❌ Error"
-                    })
-            
-            st.session_state.converted_files = converted_files
+                
+                st.session_state.converted_files = converted_files
+                st.session_state.conversion_summary = (conversion_results, pages_per_copy, enhanced_files)
+                st.session_state.conversion_key = upload_key
+        
+        converted_files = st.session_state.converted_files
+        conversion_results, pages_per_copy, enhanced_files = st.session_state.conversion_summary
         
-        # Show conversion results with quality indicators
+        # Show conversion results with quality indicators (one table widget instead of five columns per file)
         if conversion_results:
             st.markdown("#### 📋 Conversion Results")
             
-            for result in conversion_results:
-                with st.container():
-                    col1, col2, col3, col4, col5 = st.columns([3, 2, 1, 1, 1])
-                    
-                    with col1:
-                        st.write(f"**{result['filename']}**")
-                    with col2:
-                        st.write(result['status'])
-                    with col3:
-                        st.write(result['quality'])
-                    with col4:
-                        st.write(f"Method: {result['method']}")
-                    with col5:
-                        st.write(f"Pages: {result['pages']}")
-                    
-                    if "enhanced" in result.get('method', ''):
-                        st.markdown('<div class="quality-indicator">🌟 Enhanced quality conversion applied!</div>', unsafe_allow_html=True)
+            st.dataframe(
+                [{
+                    "File": result['filename'],
+                    "Status": result['status'],
+                    "Quality": result['quality'],
+                    "Method": result['method'],
+                    "Pages": result['pages'],
+                } for result in conversion_results],
+                hide_index=True,
+                use_container_width=True
+            )
+            
+            if enhanced_files:
+                st.markdown('<div class="quality-indicator">🌟 Enhanced quality conversion applied!</div>', unsafe_allow_html=True)
         
-        # File Preview Section
+        # File Preview Section: a selectable table; details and buttons only for the selected file
         if converted_files:
             st.markdown("#### 👀 File Preview")
             
-            for i, cf in enumerate(converted_files):
-                with st.expander(f"📄 {cf.pdf_name} ({cf.pages} pages) - {cf.conversion_method}"):
-                    col1, col2, col3 = st.columns([2, 1, 1])
-                    
-                    with col1:
-                        st.write(f"**Original:** {cf.orig_name}")
-                        st.write(f"**Converted:** {cf.pdf_name}")
-                        st.write(f"**Method:** {cf.conversion_method}")
-                        st.write(f"**Size:** {len(cf.pdf_bytes):,} bytes")
-                        
-                        if "enhanced" in cf.conversion_method:
-                            st.success("🌟 Enhanced quality conversion")
-                        else:
-                            st.info("📄 Standard conversion")
-                    
-                    with col2:
-                        if st.button(f"👁️ Preview", key=f"preview_{i}"):
-                            b64_pdf = base64.b64encode(cf.pdf_bytes).decode('utf-8')
-                            pdf_display = f"""
-                            <iframe src="data:application/pdf;base64,{b64_pdf}" 
-                                    width="100%" height="600" type="application/pdf">
-                            </iframe>
-                            """
-                            st.markdown(pdf_display, unsafe_allow_html=True)
+            event = st.dataframe(
+                [{
+                    "File": cf.pdf_name,
+                    "Original": cf.orig_name,
+                    "Pages": cf.pages,
+                    "Method": cf.conversion_method,
+                    "Size (bytes)": len(cf.pdf_bytes),
+                } for cf in converted_files],
+                on_select="rerun",
+                selection_mode="single-row",
+                hide_index=True,
+                use_container_width=True,
+                key="preview_table"
+            )
+            
+            for i in event.selection.rows:
+                if i >= len(converted_files):
+                    continue
+                cf = converted_files[i]
+                col1, col2, col3 = st.columns([2, 1, 1])
+                
+                with col1:
+                    st.write(f"**Original:** {cf.orig_name}")
+                    st.write(f"**Converted:** {cf.pdf_name}")
                     
-                    with col3:
-                        st.download_button(
-                            "💾 Download PDF",
-                            data=cf.pdf_bytes,
-                            file_name=cf.pdf_name,
-                            mime="application/pdf",
-                            key=f"download_{i}"
-                        )
+                    if "enhanced" in cf.conversion_method:
+                        st.success("🌟 Enhanced quality conversion")
+                    else:
+                        st.info("📄 Standard conversion")
+                
+                with col2:
+                    show_preview = st.button("👁️ Preview", key="preview_selected")
+                
+                with col3:
+                    st.download_button(
+                        "💾 Download PDF",
+                        data=cf.pdf_bytes,
+                        file_name=cf.pdf_name,
+                        mime="application/pdf",
+                        key="download_selected"
+                    )
+                
+                if show_preview:
+                    if len(cf.pdf_bytes) > PREVIEW_MAX_BYTES:
+                        st.info("📄 Too large for an inline preview - use Download PDF instead.")
+                    else:
+                        data_uri = pdf_data_uri(cf.sha256 or hashlib.sha256(cf.pdf_bytes).hexdigest(), cf.pdf_bytes)
+                        pdf_display = f"""
+                        <iframe src="{data_uri}" 
+                                width="100%" height="600" type="application/pdf">
+                        </iframe>
+                        """
+                        st.markdown(pdf_display, unsafe_allow_html=True)
         
         # Print Job Settings
         if converted_files:
-            st.markdown("#### ⚙️ Print Job Settings")
-            
-            col1, col2, col3 = st.columns(3)
-            
-            with col1:
-                copies = st.number_input(
-                    "Copies", 
-                    min_value=1, 
-                    max_value=20, 
-                    value=1,
-                    help="Number of copies for each file"
-                )
-            
-            with col2:
-                color_mode = st.selectbox(
-                    "Color Mode",
-                    options=["Auto", "Color", "Monochrome"],
-                    help="Color printing mode"
-                )
-            
-            with col3:
-                paper_size = st.selectbox(
-                    "Paper Size",
-                    options=["A4", "A3", "Letter"],
-                    help="Paper size for printing"
-                )
-            
-            # Calculate total pages and estimated cost
-            total_pages = sum(cf.pages * copies for cf in converted_files)
-            pricing = st.session_state.pricing
-            
-            is_color = "color" in color_mode.lower()
-            estimated_cost = calculate_amount(pricing, total_pages, 1, is_color, False)
-            
-            st.info(f"📊 **Total Pages:** {total_pages} | **Estimated Cost:** ₹{estimated_cost:.2f}")
-            
-            # Quality Summary
-            enhanced_files = sum(1 for cf in converted_files if "enhanced" in cf.conversion_method)
-            if enhanced_files > 0:
-                st.success(f"🌟 {enhanced_files} out of {len(converted_files)} files converted with enhanced quality!")
-            
-            # Upload Button
-            job_settings = {
-                "copies": copies,
-                "color_mode": color_mode,
-                "paper_size": paper_size
-            }
-            
-            if st.button("🚀 Send Files for Printing", type="primary", use_container_width=True):
-                success = upload_files_to_firestore(converted_files, job_settings)
-                if success:
-                    st.success("✅ Files uploaded successfully!")
+            render_job_settings(converted_files, pages_per_copy, enhanced_files)
 
 # Status Display
 if st.session_state.get("status"):
@@ -1704,13 +2196,7 @@ if st.session_state.get("process_complete"):
     st.success("🎉 **Print job submitted successfully!**")
     st.info("Your files have been sent to the print shop. Please proceed with payment and collect your prints.")
     
-    if st.button("🔄 Start New Print Job", type="primary"):
-        st.session_state.converted_files = []
-        st.session_state.payinfo = None
-        st.session_state.process_complete = False
-        st.session_state.status = ""
-        st.session_state.user_id = str(uuid.uuid4())[:8]
-        st.rerun()
+    st.button("🔄 Start New Print Job", type="primary", on_click=start_new_print_job)
 
 # Cloud Deployment Guide
 st.markdown("---")
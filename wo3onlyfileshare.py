@@ -25,17 +25,50 @@ import hashlib
 import uuid
 import time
 import json
+import random
+import math
 from datetime import datetime
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, ALL_COMPLETED
+
+# Optional faster zlib-compatible deflate (same zlib-framed output, so receivers are unaffected)
+try:
+    from zlib_ng import zlib_ng
+    ZLIB_NG_AVAILABLE = True
+except ImportError:
+    zlib_ng = None
+    ZLIB_NG_AVAILABLE = False
+
+# Optional SIMD base64 codec (byte-identical output to stdlib base64)
+try:
+    import pybase64
+    PYBASE64_AVAILABLE = True
+except ImportError:
+    pybase64 = None
+    PYBASE64_AVAILABLE = False
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    zstandard = None
+    ZSTD_AVAILABLE = False
 
 # firebase-admin
 import firebase_admin
 from firebase_admin import credentials, firestore
+from google.api_core import exceptions as gexc
+
+# Transient Firestore errors worth retrying; others (InvalidArgument, PermissionDenied, ...) fail immediately
+RETRYABLE_ERRORS = (gexc.Aborted, gexc.DeadlineExceeded, gexc.ServiceUnavailable, gexc.ResourceExhausted,
+                    gexc.InternalServerError)
 
 
 # ---------------- Helpers ----------------
 
-def retry_with_backoff(fn, max_attempts=5, initial_delay=1.0, factor=2.0, exceptions=(Exception,), log_fn=None):
+def retry_with_backoff(fn, max_attempts=5, initial_delay=1.0, cap=20.0, exceptions=(Exception,), log_fn=None):
     attempt = 0
+    delay = initial_delay
     while True:
         try:
             return fn()
@@ -43,7 +76,8 @@ def retry_with_backoff(fn, max_attempts=5, initial_delay=1.0, factor=2.0, except
             attempt += 1
             if attempt >= max_attempts:
                 raise
-            delay = initial_delay * (factor ** (attempt - 1))
+            # decorrelated jitter: parallel writers spread their retries instead of retrying in lockstep
+            delay = min(cap, random.uniform(initial_delay, delay * 3))
             if log_fn:
                 try:
                     log_fn(f"Attempt {attempt}/{max_attempts} failed: {e}. Retrying in {delay:.1f}s...")
@@ -79,51 +113,218 @@ def init_firestore_from_uploaded_file(uploaded_file):
     return firestore.client()
 
 
-def sha256_hex(b: bytes) -> str:
-    return hashlib.sha256(b).hexdigest()
+def hash_and_compress(raw: bytes, mode: str, block_size: int = 256 * 1024):
+    """
+    Single pass over `raw` in blocks: each block updates the SHA-256 and is fed to the
+    compressor while it is still cache-warm. `mode` is "none", "zlib" or "zstd" (the manifest's "compression").
+    Returns (sha256 hex, payload).
+    """
+    h = hashlib.sha256()
+    if mode == "zstd":
+        # size= keeps the content size in the frame header, like one-shot ZstdCompressor.compress()
+        comp = zstandard.ZstdCompressor(level=3).compressobj(size=len(raw))
+    elif mode == "zlib":
+        comp = zlib_ng.compressobj(6) if ZLIB_NG_AVAILABLE else zlib.compressobj(6)
+    else:
+        comp = None
+
+    view = memoryview(raw)
+    out = []
+    for j in range(0, len(raw), block_size):
+        block = view[j:j + block_size]
+        h.update(block)
+        if comp is not None:
+            out.append(comp.compress(block))
+    if comp is None:
+        return h.hexdigest(), raw
+    out.append(comp.flush())
+    return h.hexdigest(), b"".join(out)
+
+
+def iter_base64_parts(payload: bytes, chunk_size_chars: int):
+    """
+    Yield base64 parts of at most `chunk_size_chars`, encoding one slice at a time.
+    Slices are a multiple of 3 bytes, so the parts join to exactly base64(payload).
+    """
+    raw_chunk = chunk_size_chars // 4 * 3
+    view = memoryview(payload)  # slices of a memoryview are not copied before encoding
+    for j in range(0, len(payload), raw_chunk):
+        if PYBASE64_AVAILABLE:
+            yield pybase64.b64encode_as_string(view[j:j + raw_chunk])
+        else:
+            yield base64.b64encode(view[j:j + raw_chunk]).decode('ascii')
 
 
-def compress_if_needed(b: bytes, do_compress: bool):
-    return zlib.compress(b) if do_compress else b
+def iter_byte_parts(payload: bytes, chunk_size_bytes: int):
+    """Yield raw byte slices for chunk docs stored as Firestore bytes fields (no base64 inflation)."""
+    for j in range(0, len(payload), chunk_size_bytes):
+        yield payload[j:j + chunk_size_bytes]
 
 
-def split_base64_into_parts(b64_full: str, chunk_size_chars: int):
-    return [b64_full[i:i + chunk_size_chars] for i in range(0, len(b64_full), chunk_size_chars)]
+MAX_CHUNK_DOC_BYTES = 1_048_000  # Firestore document limit is 1 MiB including field names
+MAX_COMMIT_BYTES = 9 * 1024 * 1024  # stay under Firestore's 10 MiB request limit per batch commit
 
 
-def upload_chunks_in_batches(db, collection: str, file_id: str, parts: list, log_fn=None, batch_size=300):
-    total_chunks = len(parts)
-    idx = 0
-    while idx < total_chunks:
+def upload_chunks_in_batches(db, collection: str, file_id: str, parts, log_fn=None, batch_size=300, max_workers=20,
+                             parallel_writes=False):
+    """
+    Commit chunk docs in batches of `batch_size`, with up to `max_workers` batch commits in flight.
+    `parts` may be any iterable (e.g. iter_base64_parts); it is consumed one batch at a time.
+    With `parallel_writes`, every chunk is its own set() call instead, so a failure retries one chunk, not a batch.
+    `log_fn` is only called from the calling (Streamlit) thread; worker threads must not touch st.*.
+    """
+    step = 1 if parallel_writes else batch_size
+    coll_ref = db.collection(collection)
+
+    def _commit_range(idx, group):
+        end = idx + len(group)
+        if parallel_writes:
+            doc_ref = coll_ref.document(f"{file_id}_{idx}")
+            retry_with_backoff(lambda: doc_ref.set({"chunk_index": idx, "data": group[0]}),
+                               max_attempts=6, initial_delay=1.0, exceptions=RETRYABLE_ERRORS)
+            return idx, end
+
         batch = db.batch()
-        end = min(idx + batch_size, total_chunks)
-        for i in range(idx, end):
-            doc_ref = db.collection(collection).document(f"{file_id}_{i}")
-            batch.set(doc_ref, {"chunk_index": i, "data": parts[i]})
+        for i, part in enumerate(group, start=idx):
+            doc_ref = coll_ref.document(f"{file_id}_{i}")
+            batch.set(doc_ref, {"chunk_index": i, "data": part})
 
         def _commit():
             batch.commit()
             return True
 
-        retry_with_backoff(_commit, max_attempts=6, initial_delay=1.0, factor=2.0, exceptions=(Exception,), log_fn=log_fn)
-        if log_fn:
-            log_fn(f"Committed chunks {idx}..{end - 1}")
-        idx = end
+        retry_with_backoff(_commit, max_attempts=6, initial_delay=1.0, exceptions=RETRYABLE_ERRORS)
+        return idx, end
+
+    def _collect(futures, return_when):
+        done, not_done = wait(futures, return_when=return_when)
+        for fut in done:
+            idx, end = fut.result()
+            if log_fn:
+                log_fn(f"Committed chunks {idx}..{end - 1}")
+        return not_done
+
+    # Producer/consumer: the next group is encoded while earlier groups commit, with at most
+    # 2 * max_workers groups in flight so memory stays bounded regardless of file size.
+    total_chunks = 0
+    parts_iter = iter(parts)
+    pending = set()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        try:
+            while True:
+                group = list(islice(parts_iter, step))
+                if not group:
+                    break
+                if any(len(part) > MAX_CHUNK_DOC_BYTES for part in group):
+                    raise ValueError("chunk exceeds Firestore document limit")
+                pending.add(pool.submit(_commit_range, total_chunks, group))
+                total_chunks += len(group)
+                if len(pending) >= 2 * max_workers:
+                    pending = _collect(pending, FIRST_COMPLETED)
+            _collect(pending, ALL_COMPLETED)
+        except Exception:
+            for fut in pending:
+                fut.cancel()
+            raise
+    return total_chunks
+
+
+def upload_chunks_bulk_writer(db, collection: str, file_id: str, parts, log_fn=None, max_attempts=6):
+    """
+    Write chunk docs through Firestore's BulkWriter, which batches, ramps up throughput and
+    retries failed writes itself. Raises if any chunk still fails after `max_attempts`.
+    """
+    coll_ref = db.collection(collection)
+    failures = []
+
+    def _on_error(failure, _writer):
+        if failure.attempts < max_attempts:
+            return True
+        failures.append(failure)
+        return False
+
+    bw = db.bulk_writer()
+    bw.on_write_error(_on_error)
+    total_chunks = 0
+    for i, part in enumerate(parts):
+        if len(part) > MAX_CHUNK_DOC_BYTES:
+            raise ValueError("chunk exceeds Firestore document limit")
+        bw.set(coll_ref.document(f"{file_id}_{i}"), {"chunk_index": i, "data": part})
+        total_chunks += 1
+    bw.close()  # flushes pending writes and waits for them
+    if failures:
+        raise RuntimeError(f"{len(failures)} chunk write(s) failed: {failures[0].message}")
+    if log_fn:
+        log_fn(f"Committed {total_chunks} chunks via BulkWriter")
     return total_chunks
 
 
 def write_manifest(db, collection: str, file_id: str, manifest: dict, log_fn=None):
     meta_doc_id = f"{file_id}_meta"
+    doc_ref = db.collection(collection).document(meta_doc_id)
 
     def _set():
-        db.collection(collection).document(meta_doc_id).set(manifest)
+        doc_ref.set(manifest)
         return True
 
-    retry_with_backoff(_set, max_attempts=6, initial_delay=1.0, factor=2.0, exceptions=(Exception,), log_fn=log_fn)
+    retry_with_backoff(_set, max_attempts=6, initial_delay=1.0, exceptions=RETRYABLE_ERRORS, log_fn=log_fn)
     if log_fn:
         log_fn(f"Wrote manifest {meta_doc_id}")
 
 
+def fetch_manifests(db, collection: str, file_ids: list) -> dict:
+    """
+    Read the `{file_id}_meta` manifests for several files in one batched get_all call.
+    Returns {file_id: manifest dict, or None when the manifest does not exist yet}.
+    """
+    coll_ref = db.collection(collection)
+    refs = [coll_ref.document(f"{fid}_meta") for fid in file_ids]
+    manifests = {}
+    for snap in db.get_all(refs):
+        fid = snap.id[:-len("_meta")]
+        manifests[fid] = snap.to_dict() if snap.exists else None
+    return manifests
+
+
+def cached_manifest(db, collection: str, file_id: str, refresh: bool = False):
+    """
+    Return a file's manifest from the session status cache while it is fresh,
+    otherwise fetch just that document and store it in the cache.
+    refresh=True always reads Firestore (explicit Refresh clicks) and updates the cache.
+    """
+    cache = st.session_state['status_cache']
+    if not refresh and file_id in cache and time.time() - cache[file_id][0] < STATUS_CACHE_TTL:
+        return cache[file_id][1]
+    meta = db.collection(collection).document(f"{file_id}_meta").get()
+    md = meta.to_dict() if meta.exists else None
+    cache[file_id] = (time.time(), md)
+    return md
+
+
+def prepare_payload(uploaded_file, compression: str):
+    """
+    Return (sha256, compressed payload) for an uploaded file, reusing the session's result
+    when the same upload is sent again with the same compression mode.
+    """
+    key = (uploaded_file.name, uploaded_file.size, getattr(uploaded_file, "file_id", None), compression)
+    cache = st.session_state['payload_cache']
+    entry = cache.pop(key, None)
+    if entry is None:
+        entry = hash_and_compress(uploaded_file.getvalue(), compression)
+    cache[key] = entry  # reinsert as most recently used
+    while len(cache) > PAYLOAD_CACHE_SIZE:
+        del cache[next(iter(cache))]
+    return entry
+
+
+def prune_payload_cache(uploaded_files):
+    """Drop cached payloads for uploads that are no longer selected in the file uploader."""
+    live = {(f.name, f.size, getattr(f, "file_id", None)) for f in uploaded_files or []}
+    cache = st.session_state['payload_cache']
+    for key in [k for k in cache if k[:3] not in live]:
+        del cache[key]
+
+
 def pretty_ts(x):
     try:
         if not x:
@@ -137,6 +338,9 @@ def pretty_ts(x):
 
 # ---------------- Streamlit UI ----------------
 
+STATUS_CACHE_TTL = 30  # seconds a fetched manifest is reused before re-reading it
+PAYLOAD_CACHE_SIZE = 4  # compressed payloads kept per session; each can be tens of MB
+
 st.set_page_config(page_title="Firestore File Sender (uploader-only)", layout="wide")
 st.title("Firestore File Sender — uploader-only (no st.secrets)")
 
@@ -149,9 +353,18 @@ with st.sidebar:
 
     st.markdown("---")
     st.markdown("**Chunking & compression**")
-    chunk_kb = st.number_input("Chunk size (KB)", min_value=16, max_value=256, value=128, step=8)
-    compress = st.checkbox("Compress payload with zlib", value=True)
+    chunk_kb = st.number_input("Chunk size (KB)", min_value=16, max_value=1000, value=900, step=8)
+    st.caption("Firestore allows ~1 MiB per document; 900 KB leaves headroom and keeps the chunk count low.")
+    compression_modes = ["zlib", "none"] + (["zstd"] if ZSTD_AVAILABLE else [])
+    compression = st.selectbox("Payload compression", options=compression_modes, index=0)
+    if compression == "zstd":
+        st.caption("zstd is faster and smaller than zlib, but the receiver must support it.")
+    encoding = st.selectbox("Chunk encoding", options=["base64", "raw"], index=0,
+                            help="raw stores chunk bytes directly (about 25% fewer bytes); the receiver must support it.")
     create_manifest_first = st.checkbox("Create manifest BEFORE chunks", value=True)
+    write_mode = st.selectbox("Chunk write mode", options=["batched", "parallel", "bulk_writer"], index=0,
+                              help="batched: concurrent batch commits; parallel: one write per chunk with per-chunk retry; "
+                                   "bulk_writer: Firestore BulkWriter with built-in throttling and retries.")
 
     st.markdown("---")
     st.markdown("**Sender identity**")
@@ -170,6 +383,11 @@ uploaded_files = st.file_uploader("Select file(s) to send", accept_multiple_file
 
 if 'sent_ids' not in st.session_state:
     st.session_state['sent_ids'] = []
+if 'status_cache' not in st.session_state:
+    st.session_state['status_cache'] = {}  # file_id -> (fetched_at, manifest or None)
+if 'payload_cache' not in st.session_state:
+    st.session_state['payload_cache'] = {}  # (name, size, upload id, compression) -> (sha256, payload), LRU order
+prune_payload_cache(uploaded_files)
 
 # Initialize Firestore (uploader-only)
 try:
@@ -182,16 +400,13 @@ if uploaded_files:
     for f in uploaded_files:
         st.write(f"**File:** {f.name} — {int(f.size / 1024)} KB")
         with st.expander(f"Send options — {f.name}"):
+            st.caption(f"Expected chunks (before compression): ~{math.ceil(f.size * (4 / 3 if encoding == 'base64' else 1) / (int(chunk_kb) * 1024)) or 1}")
             if st.button(f"Send '{f.name}' now", key=f"send_{f.name}_{f.size}"):
                 try:
                     with st.spinner("Uploading..."):
-                        raw = f.read()
-                        sha = sha256_hex(raw)
-                        compressed = compress_if_needed(raw, compress)
-                        compressed_flag = compress
-                        b64 = base64.b64encode(compressed).decode('ascii')
+                        sha, compressed = prepare_payload(f, compression)
 
-                        chunk_size_chars = int(chunk_kb) * 1024
+                        chunk_size = int(chunk_kb) * 1024  # chars for base64 parts, bytes for raw parts
                         file_id = uuid.uuid4().hex
 
                         settings = {
@@ -212,17 +427,28 @@ if uploaded_files:
                                 "settings": settings,
                                 "user": user_meta,
                                 "timestamp": int(time.time()),
-                                "compression": "zlib" if compressed_flag else "none",
+                                "compression": compression,
+                                "encoding": encoding,
                             }
                             write_manifest(db, collection, file_id, initial_manifest, log_fn=lambda m: None)
 
-                        parts = split_base64_into_parts(b64, chunk_size_chars)
+                        if encoding == "raw":
+                            parts = iter_byte_parts(compressed, chunk_size)
+                        else:
+                            parts = iter_base64_parts(compressed, chunk_size)
                         log_area = st.empty()
 
                         def log(msg):
                             log_area.text(msg)
 
-                        total_chunks = upload_chunks_in_batches(db, collection, file_id, parts, log_fn=log, batch_size=300)
+                        if write_mode == "bulk_writer":
+                            total_chunks = upload_chunks_bulk_writer(db, collection, file_id, parts, log_fn=log)
+                        else:
+                            parallel_writes = write_mode == "parallel"
+                            total_chunks = upload_chunks_in_batches(db, collection, file_id, parts, log_fn=log,
+                                                                    batch_size=max(1, min(300, MAX_COMMIT_BYTES // chunk_size)),
+                                                                    max_workers=40 if parallel_writes else 20,
+                                                                    parallel_writes=parallel_writes)
 
                         manifest = {
                             "file_name": f.name,
@@ -231,53 +457,97 @@ if uploaded_files:
                             "settings": settings,
                             "user": user_meta,
                             "timestamp": int(time.time()),
-                            "compression": "zlib" if compressed_flag else "none",
+                            "compression": compression,
+                            "encoding": encoding,
                         }
                         write_manifest(db, collection, file_id, manifest, log_fn=log)
 
                         st.success(f"Upload complete for {f.name}. file_id={file_id}, chunks={total_chunks}")
-                        st.session_state['sent_ids'].append({"file_id": file_id, "file_name": f.name})
+                        st.session_state['sent_ids'].append({
+                            "file_id": file_id,
+                            "file_name": f.name,
+                            "sent_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                        })
                 except Exception as e:
                     st.error(f"Upload failed: {e}")
 
+
+@st.fragment
+def render_sent_row(info):
+    """One sent-file row; runs as a fragment so its buttons rerun only this row."""
+    cols = st.columns([1, 4, 2, 2])
+    cols[0].write(info['file_id'][:8])
+    cols[1].write(info['file_name'])
+    if cols[2].button(f"Refresh {info['file_id'][:8]}", key=f"refresh_{info['file_id']}"):
+        try:
+            md = cached_manifest(db, collection, info['file_id'], refresh=True)
+            if md is None:
+                st.warning("Manifest not found yet")
+            else:
+                st.json(md)
+                payinfo = md.get('payinfo')
+                if payinfo:
+                    st.success(f"Receiver payinfo: amount {payinfo.get('amount_str')} {payinfo.get('currency')} — status {payinfo.get('status')}")
+                    st.write(payinfo)
+                else:
+                    st.info("No payinfo yet in manifest.")
+        except Exception as e:
+            st.error(f"Failed to fetch manifest: {e}")
+    if cols[3].button(f"Open UPI (if present)", key=f"upi_{info['file_id']}"):
+        try:
+            md = cached_manifest(db, collection, info['file_id']) or {}
+            payinfo = md.get('payinfo') or {}
+            upi = payinfo.get('upi_url') or md.get('upi_url') or None
+            if upi:
+                cols[3].write(f"UPI url: {upi}")
+            else:
+                cols[3].info("No UPI url present yet.")
+        except Exception as e:
+            cols[3].error(str(e))
+
+
 st.markdown("---")
 st.subheader("Sent files / check status")
 if st.session_state['sent_ids']:
+    if st.button("Refresh all statuses"):
+        try:
+            fetched_at = time.time()
+            manifests = fetch_manifests(db, collection, [info['file_id'] for info in st.session_state['sent_ids']])
+            for fid, md in manifests.items():
+                st.session_state['status_cache'][fid] = (fetched_at, md)
+            found = [md for md in manifests.values() if md]
+            paid = sum(1 for md in found if md.get('payinfo'))
+            st.success(f"Refreshed {len(manifests)} file(s): {len(found)} manifest(s) found, {paid} with payinfo. "
+                       "Select a row for details.")
+        except Exception as e:
+            st.error(f"Failed to fetch manifests: {e}")
+    rows = []
     for info in st.session_state['sent_ids']:
-        cols = st.columns([1, 4, 2, 2])
-        cols[0].write(info['file_id'][:8])
-        cols[1].write(info['file_name'])
-        if cols[2].button(f"Refresh {info['file_id'][:8]}", key=f"refresh_{info['file_id']}"):
-            try:
-                meta = db.collection(collection).document(f"{info['file_id']}_meta").get()
-                if not meta.exists:
-                    st.warning("Manifest not found yet")
-                else:
-                    md = meta.to_dict()
-                    st.json(md)
-                    payinfo = md.get('payinfo')
-                    if payinfo:
-                        st.success(f"Receiver payinfo: amount {payinfo.get('amount_str')} {payinfo.get('currency')} — status {payinfo.get('status')}")
-                        st.write(payinfo)
-                    else:
-                        st.info("No payinfo yet in manifest.")
-            except Exception as e:
-                st.error(f"Failed to fetch manifest: {e}")
-        if cols[3].button(f"Open UPI (if present)", key=f"upi_{info['file_id']}"):
-            try:
-                md = db.collection(collection).document(f"{info['file_id']}_meta").get().to_dict() or {}
-                payinfo = md.get('payinfo') or {}
-                upi = payinfo.get('upi_url') or md.get('upi_url') or None
-                if upi:
-                    cols[3].write(f"UPI url: {upi}")
-                else:
-                    cols[3].info("No UPI url present yet.")
-            except Exception as e:
-                cols[3].error(str(e))
+        md = st.session_state['status_cache'].get(info['file_id'], (0, None))[1] or {}
+        payinfo = md.get('payinfo') or {}
+        rows.append({
+            "File ID": info['file_id'][:8],
+            "File": info['file_name'],
+            "Sent": info.get('sent_at', "N/A"),
+            "Chunks": md.get('total_chunks'),
+            "Payment": payinfo.get('status') or "—",
+        })
+    # One table widget for the list; detail buttons only for the selected row
+    event = st.dataframe(rows, on_select="rerun", selection_mode="single-row", hide_index=True,
+                         use_container_width=True, key="sent_table")
+    for row in event.selection.rows:
+        if row < len(st.session_state['sent_ids']):
+            render_sent_row(st.session_state['sent_ids'][row])
 else:
     st.info("No files sent in this session yet.")
 
-if st.button("Clear sent IDs"):
+
+def clear_sent_ids():
     st.session_state['sent_ids'] = []
+    st.session_state['status_cache'] = {}
+    st.session_state['payload_cache'] = {}
+
+
+st.button("Clear sent IDs", on_click=clear_sent_ids)
 
 st.caption("Reminder: Do not expose service-account credentials in a client app for production.")